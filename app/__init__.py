@@ -1,39 +1,125 @@
 import os
+import atexit
+import click
 from flask import Flask
 from flask_sqlalchemy import SQLAlchemy
-from apscheduler.schedulers.background import BackgroundScheduler
+from app.utils.render_service import RenderService
 
 # Initialize extensions
 db = SQLAlchemy()
-scheduler = BackgroundScheduler()
+scheduler = None
+render_service = RenderService()
+job_workers = []
+
+
+def get_scheduler():
+    """Return the process-wide background scheduler, importing APScheduler on first use"""
+    global scheduler
+    if scheduler is None:
+        from apscheduler.schedulers.background import BackgroundScheduler
+        scheduler = BackgroundScheduler()
+    return scheduler
+
+
+def start_background_services(app, run_scheduler=True, worker_count=None, kinds=None):
+    """
+    Start the periodic scheduler and job queue workers for this process
+    Any number of processes may do this: periodic jobs are enqueued once
+    per interval and each queued job is claimed by exactly one worker
+    """
+    from app.utils.instagram_scheduler import schedule_instagram_posts
+    from app.utils.job_queue import JobWorker
+    
+    if run_scheduler and not get_scheduler().running:
+        with app.app_context():
+            schedule_instagram_posts(scheduler)
+        scheduler.start()
+    
+    for _ in range(app.config.get('JOB_WORKERS', 2) if worker_count is None else worker_count):
+        worker = JobWorker(app, kinds=kinds)
+        worker.start()
+        job_workers.append(worker)
+    
+    atexit.register(shutdown_services)
+
+
+def shutdown_services():
+    """Stop the scheduler, job workers and the render pool together"""
+    if scheduler is not None and scheduler.running:
+        scheduler.shutdown(wait=False)
+    while job_workers:
+        job_workers.pop().stop()
+    render_service.shutdown(wait=True)
+
 
 def create_app(config_name='development'):
     """Factory function to create and configure the Flask application"""
     from config.config import config_by_name
+    from app.utils.startup_profile import StartupTimer
     
     # Create Flask app
     app = Flask(__name__)
     
     # Load configuration
     app.config.from_object(config_by_name[config_name])
+    timer = StartupTimer(enabled=app.config.get('STARTUP_PROFILE', False))
     
     # Set up extensions
     db.init_app(app)
+    timer.mark('config')
     
     # Register blueprints
     from app.routes import main_bp, api_bp, admin_bp
     app.register_blueprint(main_bp)
     app.register_blueprint(api_bp, url_prefix='/api')
     app.register_blueprint(admin_bp, url_prefix='/admin')
+    timer.mark('blueprints')
     
-    # Initialize database
-    with app.app_context():
-        db.create_all()
+    # Set up the text-generation model registry
+    from app.utils.model_registry import init_model_registry
+    init_model_registry(app)
     
-    # Initialize scheduler for automated posting
-    if not scheduler.running:
-        from app.utils.instagram_scheduler import schedule_instagram_posts
-        schedule_instagram_posts(scheduler)
-        scheduler.start()
+    # Set up the image render pool
+    render_service.init_app(app)
+    
+    # Cache account credentials and renew tokens ahead of expiry
+    from app.utils.credentials import credential_manager
+    credential_manager.init_app(app)
+    
+    # Pick content templates from memory, rebuilt when templates change
+    from app.utils.template_index import template_index
+    template_index.init_app(app)
+    
+    # Keep the dashboard counters in step with post status changes
+    from app.utils.post_stats import init_post_stats, rebuild_post_stats
+    init_post_stats()
+    timer.mark('services')
+    
+    # Add any tables, columns and indexes missing from older databases,
+    # when enabled; otherwise run `flask upgrade-db` once per deploy
+    from app.utils.migrations import upgrade_schema
+    if app.config.get('AUTO_UPGRADE_SCHEMA', False):
+        with app.app_context():
+            upgrade_schema()
+        timer.mark('schema')
+    
+    @app.cli.command('upgrade-db')
+    def upgrade_db():
+        """Add missing tables, columns and indexes to the database"""
+        for change in upgrade_schema() or ['schema is up to date']:
+            click.echo(change)
+    
+    @app.cli.command('rebuild-stats')
+    def rebuild_stats():
+        """Recompute the dashboard counters from the post table"""
+        rebuild_post_stats()
+        click.echo('post stats rebuilt')
+    
+    # Start the scheduler and job workers for automated posting when enabled;
+    # otherwise they run separately through worker.py
+    if app.config.get('SCHEDULER_IN_APP', False) and (scheduler is None or not scheduler.running):
+        start_background_services(app)
+        timer.mark('background services')
     
-    return app
\ No newline at end of file
+    timer.report(app.logger)
+    return app
@@ -1,3 +1,4 @@
+import json
 from datetime import datetime
 from app import db
 
@@ -8,13 +9,27 @@ class Post(db.Model):
     image_path = db.Column(db.String(255), nullable=False)
     image_url = db.Column(db.String(255))
     creation_id = db.Column(db.String(255))
+    container_attempts = db.Column(db.Integer, default=0)  # Media containers that died before publishing; NULL on older rows means 0
     instagram_id = db.Column(db.String(255))
-    status = db.Column(db.String(50), default='draft')  # draft, pending, published, failed
+    account_id = db.Column(db.Integer, db.ForeignKey('instagram_account.id'))
+    # Old value is always loaded on change so the stats counters see every transition
+    status = db.column_property(db.Column(db.String(50), default='draft'), active_history=True)  # draft, pending, processing, published, failed
     scheduled_time = db.Column(db.DateTime)
     published_time = db.Column(db.DateTime)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
+    account = db.relationship('InstagramAccount')
+    
+    __table_args__ = (
+        # "Find due posts" and status filters
+        db.Index('ix_post_status_scheduled_time', 'status', 'scheduled_time'),
+        # Newest-first listings, with id as the tie-breaker for keyset paging
+        db.Index('ix_post_created_at_id', 'created_at', 'id'),
+        db.Index('ix_post_instagram_id', 'instagram_id'),
+        db.Index('ix_post_account_id', 'account_id'),
+    )
+    
     def __repr__(self):
         return f'<Post {self.id}: {self.status}>'
     
@@ -25,6 +40,7 @@ class Post(db.Model):
             'image_path': self.image_path,
             'image_url': self.image_url,
             'instagram_id': self.instagram_id,
+            'account_id': self.account_id,
             'status': self.status,
             'scheduled_time': self.scheduled_time.isoformat() if self.scheduled_time else None,
             'published_time': self.published_time.isoformat() if self.published_time else None,
@@ -33,6 +49,16 @@ class Post(db.Model):
         }
 
 
+class PostStat(db.Model):
+    """Post counters kept up to date on every status change, backing /api/stats"""
+    metric = db.Column(db.String(50), primary_key=True)  # status, outcome, created_per_day, published_per_day
+    bucket = db.Column(db.String(50), primary_key=True)  # status name or YYYY-MM-DD
+    value = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<PostStat {self.metric}:{self.bucket} = {self.value}>'
+
+
 class ContentTemplate(db.Model):
     """Model for content generation templates"""
     id = db.Column(db.Integer, primary_key=True)
@@ -40,6 +66,8 @@ class ContentTemplate(db.Model):
     prompt = db.Column(db.Text, nullable=False)
     content_type = db.Column(db.String(50), default='caption')  # caption, hashtags, comment
     active = db.Column(db.Boolean, default=True)
+    weight = db.Column(db.Float, default=1.0)  # Relative chance of being picked among its content type
+    cooldown_seconds = db.Column(db.Integer, default=0)  # Minimum time between two picks
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
@@ -53,6 +81,8 @@ class ContentTemplate(db.Model):
             'prompt': self.prompt,
             'content_type': self.content_type,
             'active': self.active,
+            'weight': self.weight,
+            'cooldown_seconds': self.cooldown_seconds,
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
@@ -66,14 +96,75 @@ class InstagramAccount(db.Model):
     access_token = db.Column(db.Text, nullable=False)
     token_expires_at = db.Column(db.DateTime)
     active = db.Column(db.Boolean, default=True)
+    timezone = db.Column(db.String(64), default='UTC')
+    posting_slots = db.Column(db.Text)  # JSON list of local "HH:MM" times
+    blackout_windows = db.Column(db.Text)  # JSON list of local "HH:MM-HH:MM" ranges
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     def __repr__(self):
         return f'<InstagramAccount {self.id}: {self.account_name}>'
     
+    def get_posting_slots(self):
+        """Local posting times for this account, empty if it follows POST_FREQUENCY"""
+        return json.loads(self.posting_slots) if self.posting_slots else []
+    
+    def get_blackout_windows(self):
+        """Local time ranges during which this account must not post"""
+        return json.loads(self.blackout_windows) if self.blackout_windows else []
+    
+    def calendar_dict(self):
+        return {
+            'timezone': self.timezone or 'UTC',
+            'posting_slots': self.get_posting_slots(),
+            'blackout_windows': self.get_blackout_windows()
+        }
+    
     def is_token_valid(self):
         """Check if the access token is still valid"""
         if not self.token_expires_at:
             return False
-        return datetime.utcnow() < self.token_expires_at
\ No newline at end of file
+        return datetime.utcnow() < self.token_expires_at
+
+
+class Job(db.Model):
+    """Model for persistent background jobs shared by every worker process"""
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text)  # JSON keyword arguments for the handler
+    dedupe_key = db.Column(db.String(255), unique=True)
+    status = db.Column(db.String(50), default='queued')  # queued, running, done, failed
+    priority = db.Column(db.Integer, default=0)
+    run_at = db.Column(db.DateTime, default=datetime.utcnow)
+    attempts = db.Column(db.Integer, default=0)
+    max_attempts = db.Column(db.Integer, default=3)
+    locked_by = db.Column(db.String(255))
+    lease_expires_at = db.Column(db.DateTime)
+    heartbeat_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    __table_args__ = (
+        db.Index('ix_job_status_run_at', 'status', 'run_at'),
+    )
+    
+    def __repr__(self):
+        return f'<Job {self.id}: {self.kind} {self.status}>'
+    
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'payload': json.loads(self.payload) if self.payload else {},
+            'status': self.status,
+            'priority': self.priority,
+            'run_at': self.run_at.isoformat() if self.run_at else None,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'locked_by': self.locked_by,
+            'lease_expires_at': self.lease_expires_at.isoformat() if self.lease_expires_at else None,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat(),
+            'updated_at': self.updated_at.isoformat()
+        }
@@ -1,4 +1,6 @@
 from flask import Blueprint, render_template, request, jsonify, current_app
+from datetime import datetime
+from app.utils.profiling import init_request_profiling
 import os
 
 # Create blueprints
@@ -6,6 +8,10 @@ main_bp = Blueprint('main', __name__)
 api_bp = Blueprint('api', __name__)
 admin_bp = Blueprint('admin', __name__)
 
+# Optional per-request profiling, enabled with REQUEST_PROFILER
+for blueprint in (main_bp, api_bp, admin_bp):
+    init_request_profiling(blueprint)
+
 # Main routes for web interface
 @main_bp.route('/')
 def index():
@@ -17,6 +23,13 @@ def dashboard():
     """Dashboard page"""
     return render_template('dashboard.html', title='Dashboard')
 
+@main_bp.route('/metrics')
+def metrics():
+    """Pipeline stage timing histograms for this process in Prometheus text format"""
+    from app.utils.metrics import registry
+    
+    return current_app.response_class(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
 # Admin routes for content management
 @admin_bp.route('/')
 def admin_index():
@@ -25,10 +38,17 @@ def admin_index():
 
 @admin_bp.route('/posts')
 def posts():
-    """Manage posts"""
+    """Manage posts, one page at a time"""
     from app.models.models import Post
-    posts = Post.query.order_by(Post.created_at.desc()).all()
-    return render_template('admin/posts.html', title='Manage Posts', posts=posts)
+    
+    page = request.args.get('page', 1, type=int)
+    per_page = min(request.args.get('per_page', 50, type=int), 200)
+    
+    # Skip the COUNT(*) over the whole table; the index serves the ordered page
+    pagination = Post.query.order_by(Post.created_at.desc(), Post.id.desc()).paginate(
+        page=page, per_page=per_page, error_out=False, count=False
+    )
+    return render_template('admin/posts.html', title='Manage Posts', posts=pagination.items, pagination=pagination)
 
 @admin_bp.route('/templates')
 def templates():
@@ -47,32 +67,189 @@ def accounts():
 # API routes for application features
 @api_bp.route('/generate-content', methods=['POST'])
 def generate_content():
-    """Generate content using AI"""
-    from app.utils.content_generator import generate_caption
+    """
+    Generate content using AI
+    Accepts a single content_type/template_id, a list of requests, or a
+    count of posts to generate caption and hashtags for in one batch
+    With "stream": true a single request is sent as server-sent events,
+    one {"token": ...} event per chunk of text and a final {"done": true}
+    """
+    from app.utils.content_generator import generate_caption, generate_contents, generate_post_contents, stream_content
+    from flask import Response, stream_with_context
+    import json
     
-    content_type = request.json.get('content_type', 'caption')
-    template_id = request.json.get('template_id')
+    data = request.json or {}
+    
+    if data.get('stream'):
+        def events():
+            try:
+                for token in stream_content(data.get('content_type', 'caption'), data.get('template_id'), data.get('max_length')):
+                    yield f"data: {json.dumps({'token': token})}\n\n"
+                yield f"data: {json.dumps({'done': True})}\n\n"
+            except Exception as e:
+                current_app.logger.error(f"Content streaming error: {str(e)}")
+                yield f"data: {json.dumps({'done': True, 'error': str(e)})}\n\n"
+        
+        return Response(stream_with_context(events()), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
     
     try:
-        caption = generate_caption(content_type, template_id)
+        if 'requests' in data:
+            contents = generate_contents(data['requests'])
+            return jsonify({'success': True, 'contents': contents})
+        
+        if 'count' in data:
+            posts = generate_post_contents(int(data['count']))
+            return jsonify({'success': True, 'posts': posts})
+        
+        content_type = data.get('content_type', 'caption')
+        template_id = data.get('template_id')
+        max_length = data.get('max_length')
+        
+        caption = generate_caption(content_type, template_id, max_length)
         return jsonify({'success': True, 'content': caption})
     except Exception as e:
         current_app.logger.error(f"Content generation error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@api_bp.route('/models', methods=['GET'])
+def models():
+    """Report resident text-generation models with load time and memory use, and generation cache use"""
+    from app.utils.model_registry import model_registry
+    from app.utils.generation_cache import get_generation_cache
+    
+    cache = get_generation_cache()
+    return jsonify({
+        'success': True,
+        'registry': model_registry.stats(),
+        'generation_cache': cache.stats() if cache else None
+    })
+
+@api_bp.route('/rate-limits', methods=['GET'])
+def rate_limits():
+    """Report the remaining Graph API call budget for the app and each account"""
+    from app.utils.rate_limiter import get_governor
+    
+    return jsonify({'success': True, 'budget': get_governor(current_app.config).budget()})
+
+@api_bp.route('/accounts/<int:account_id>/calendar', methods=['GET', 'PUT'])
+def account_calendar(account_id):
+    """
+    Read or update an account's posting calendar
+    PUT accepts timezone, posting_slots ("HH:MM" list) and blackout_windows ("HH:MM-HH:MM" list)
+    """
+    from app.models.models import InstagramAccount
+    from app.utils.posting_calendar import next_posting_times, parse_clock
+    from app import db
+    from zoneinfo import ZoneInfo
+    import json
+    
+    account = InstagramAccount.query.get_or_404(account_id)
+    
+    try:
+        if request.method == 'PUT':
+            data = request.json or {}
+            
+            if 'timezone' in data:
+                ZoneInfo(data['timezone'])
+                account.timezone = data['timezone']
+            if 'posting_slots' in data:
+                [parse_clock(slot) for slot in data['posting_slots']]
+                account.posting_slots = json.dumps(data['posting_slots'])
+            if 'blackout_windows' in data:
+                [parse_clock(part) for window in data['blackout_windows'] for part in window.split('-')]
+                account.blackout_windows = json.dumps(data['blackout_windows'])
+            db.session.commit()
+        
+        upcoming = next_posting_times(
+            account, datetime.now(), 5, jitter_minutes=current_app.config.get('SLOT_JITTER_MINUTES', 10)
+        )
+        return jsonify({
+            'success': True,
+            'calendar': account.calendar_dict(),
+            'upcoming_slots': [slot.isoformat() for slot in upcoming]
+        })
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Calendar update error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@api_bp.route('/stats', methods=['GET'])
+def stats():
+    """
+    Post counts by status, publish success rate and daily volume
+    Served from incrementally maintained counters through a short TTL
+    cache; clients sending If-None-Match get a 304 while nothing changed
+    """
+    from app.utils.post_stats import get_cached_stats
+    
+    days = max(1, min(request.args.get('days', 30, type=int), 365))
+    ttl = current_app.config.get('STATS_CACHE_SECONDS', 15)
+    
+    body, etag = get_cached_stats(days, ttl)
+    response = current_app.response_class(body, mimetype='application/json')
+    response.set_etag(etag)
+    response.cache_control.max_age = ttl
+    return response.make_conditional(request)
+
+@api_bp.route('/posts', methods=['GET'])
+def list_posts():
+    """
+    List posts newest first, one keyset page at a time
+    Filters: status, account_id, created_after/created_before,
+    scheduled_after/scheduled_before. fields selects a subset of columns,
+    limit sets the page size and cursor continues from a previous next_cursor
+    """
+    from app.utils.post_queries import list_posts as list_post_page
+
+    try:
+        posts, next_cursor = list_post_page(request.args)
+        return jsonify({'success': True, 'posts': posts, 'next_cursor': next_cursor})
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+@api_bp.route('/posts/export', methods=['GET'])
+def export_posts():
+    """
+    Stream every post matching the /api/posts filters as NDJSON or CSV
+    Pick the format with format=ndjson (default) or format=csv
+    """
+    from app.utils.post_queries import export_posts as export_post_rows
+    from flask import Response, stream_with_context
+
+    export_format = request.args.get('format', 'ndjson')
+
+    try:
+        chunks = export_post_rows(request.args, export_format)
+    except ValueError as e:
+        return jsonify({'success': False, 'error': str(e)}), 400
+
+    mimetype = 'text/csv' if export_format == 'csv' else 'application/x-ndjson'
+    return Response(
+        stream_with_context(chunks),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=posts.{export_format}'}
+    )
+
 @api_bp.route('/create-post', methods=['POST'])
 def create_post():
     """Create a new post"""
     from app.models.models import Post
+    from app.utils.post_import import parse_datetimes
     from app import db
     
-    data = request.json
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({'success': False, 'error': 'Expected a JSON object'}), 400
     
     try:
+        scheduled, errors = parse_datetimes([data.get('scheduled_time')])
+        if errors:
+            return jsonify({'success': False, 'error': errors[0]}), 400
+        
         post = Post(
             caption=data.get('caption'),
             image_path=data.get('image_path'),
-            scheduled_time=data.get('scheduled_time')
+            scheduled_time=scheduled[0]
         )
         db.session.add(post)
         db.session.commit()
@@ -83,6 +260,53 @@ def create_post():
         current_app.logger.error(f"Post creation error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
 
+@api_bp.route('/posts/bulk', methods=['POST'])
+def bulk_create_posts():
+    """
+    Create many posts in one transaction
+    Accepts a JSON array of post objects, or an NDJSON stream with
+    Content-Type application/x-ndjson. Invalid rows are reported by index
+    and skipped without aborting the rest of the batch
+    """
+    from app.utils.post_import import import_posts, read_ndjson
+    from app import db
+    
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        rows, errors = read_ndjson(request.stream)
+    else:
+        rows, errors = request.get_json(silent=True), {}
+        if not isinstance(rows, list):
+            return jsonify({'success': False, 'error': 'Expected a JSON array of posts'}), 400
+    
+    try:
+        result = import_posts(rows, current_app.config.get('POST_IMPORT_CHUNK_SIZE', 1000), errors)
+        return jsonify({'success': True, **result})
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Bulk post creation error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/pre-generate-posts', methods=['POST'])
+def pre_generate():
+    """Generate and render a batch of draft posts in parallel"""
+    from app.utils.instagram_scheduler import pre_generate_posts
+    from app import db
+    
+    data = request.json or {}
+    
+    try:
+        start_time = data.get('start_time')
+        posts = pre_generate_posts(
+            int(data.get('count', 7)),
+            start_time=datetime.fromisoformat(start_time) if start_time else None,
+            interval_hours=data.get('interval_hours')
+        )
+        return jsonify({'success': True, 'posts': [post.to_dict() for post in posts]})
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f"Pre-generation error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @api_bp.route('/publish-post/<int:post_id>', methods=['POST'])
 def publish_post(post_id):
     """Publish a post to Instagram"""
@@ -94,7 +318,7 @@ def publish_post(post_id):
         post = Post.query.get_or_404(post_id)
         result = publish_to_instagram(post)
         
-        if result.get('success'):
+        if result.get('instagram_id'):
             post.status = 'published'
             post.instagram_id = result.get('instagram_id')
             post.published_time = datetime.utcnow()
@@ -102,5 +326,41 @@ def publish_post(post_id):
             
         return jsonify(result)
     except Exception as e:
+        current_app.logger.error(f"Publishing error: {str(e)}")
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@api_bp.route('/publish-posts', methods=['POST'])
+def publish_posts():
+    """
+    Publish several posts concurrently across accounts
+    Expects {"items": [{"post_id": 1, "account_id": 2}, ...]}; account_id
+    defaults to the post's own account
+    """
+    from app.utils.async_publisher import publish_posts as publish_pairs
+    from app.models.models import Post, InstagramAccount
+    from app import db
+    
+    items = (request.json or {}).get('items', [])
+    
+    try:
+        posts = {p.id: p for p in Post.query.filter(Post.id.in_([i['post_id'] for i in items])).all()}
+        account_ids = {i.get('account_id') or getattr(posts.get(i['post_id']), 'account_id', None) for i in items}
+        accounts = {a.id: a for a in InstagramAccount.query.filter(InstagramAccount.id.in_(account_ids)).all()}
+        
+        pairs = []
+        errors = {}
+        for item in items:
+            post = posts.get(item['post_id'])
+            account = accounts.get(item.get('account_id') or getattr(post, 'account_id', None))
+            if not post or not account or not account.active:
+                errors[item['post_id']] = {'success': False, 'error': 'Post or active account not found'}
+                continue
+            pairs.append((post, account))
+        
+        results = publish_pairs(pairs)
+        results.update(errors)
+        return jsonify({'success': True, 'results': results})
+    except Exception as e:
+        db.session.rollback()
         current_app.logger.error(f"Publishing error: {str(e)}")
         return jsonify({'success': False, 'error': str(e)}), 500
\ No newline at end of file
@@ -0,0 +1,133 @@
+import asyncio
+import logging
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.utils.instagram_publisher import create_media_container, get_public_url_for_image
+from app.utils.credentials import credential_manager
+from app.utils.rate_limiter import get_governor
+from app.utils.metrics import metrics_account
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Plain snapshot of what a worker thread needs, so threads never touch the session
+PublishJob = namedtuple('PublishJob', [
+    'id', 'image_path', 'image_url', 'creation_id', 'caption', 'access_token', 'instagram_user_id', 'account_id'
+])
+
+
+def publish_posts(pairs, max_concurrency=None, per_account_concurrency=None, commit_batch_size=None):
+    """
+    Publish many (post, account) pairs concurrently
+    Image upload and container creation run on worker threads driven by an
+    asyncio loop, capped globally and per account. Staged posts move to
+    'processing' and the container poller publishes them once Instagram has
+    processed them. Post status changes are applied on the calling thread
+    and committed in batches.
+    Returns a dict mapping post id to its publish result
+    """
+    app = current_app._get_current_object()
+    config = app.config
+
+    return asyncio.run(_publish_all(
+        app,
+        list(pairs),
+        max_concurrency or config.get('PUBLISH_MAX_CONCURRENCY', 16),
+        per_account_concurrency or config.get('PUBLISH_PER_ACCOUNT_CONCURRENCY', 2),
+        commit_batch_size or config.get('PUBLISH_COMMIT_BATCH_SIZE', 25)
+    ))
+
+
+async def _publish_all(app, pairs, max_concurrency, per_account_concurrency, commit_batch_size):
+    loop = asyncio.get_running_loop()
+    results = {}
+    uncommitted = 0
+
+    # Start accounts that have call budget left before throttled ones
+    pairs = get_governor(app.config).order(pairs, key=lambda pair: pair[1].instagram_user_id)
+
+    # Cached credentials per account; only already expired tokens are refreshed here
+    accounts = {account.id: account for _, account in pairs}
+    credentials = {account_id: credential_manager.get(account_id) for account_id in accounts}
+
+    global_limit = asyncio.Semaphore(max_concurrency)
+    account_limits = {account_id: asyncio.Semaphore(per_account_concurrency) for account_id in accounts}
+
+    def commit_if_due(force=False):
+        nonlocal uncommitted
+        if uncommitted and (force or uncommitted >= commit_batch_size):
+            db.session.commit()
+            uncommitted = 0
+
+    async def publish_one(post, account, executor):
+        nonlocal uncommitted
+
+        account_credentials = credentials[account.id]
+        if account_credentials is None or account_credentials.is_expired():
+            result = {'success': False, 'error': 'Failed to refresh access token'}
+        else:
+            job = PublishJob(
+                post.id, post.image_path, post.image_url, post.creation_id,
+                post.caption, account_credentials.access_token, account_credentials.instagram_user_id, account.id
+            )
+            # Take the account slot first so a busy account never holds a global slot
+            async with account_limits[account.id]:
+                async with global_limit:
+                    result = await loop.run_in_executor(executor, _publish_job, app, job)
+
+        _apply_result(post, account, result)
+        results[post.id] = result
+        uncommitted += 1
+        commit_if_due()
+
+    with ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='publisher') as executor:
+        outcomes = await asyncio.gather(
+            *(publish_one(post, account, executor) for post, account in pairs),
+            return_exceptions=True
+        )
+
+    for (post, _), outcome in zip(pairs, outcomes):
+        if isinstance(outcome, Exception):
+            logger.error(f"Exception when publishing post {post.id}: {str(outcome)}")
+            results[post.id] = {'success': False, 'error': str(outcome)}
+
+    commit_if_due(force=True)
+    return results
+
+
+def _publish_job(app, job):
+    """Upload the image and create the media container for one post on a worker thread"""
+    with app.app_context(), metrics_account(job.account_id):
+        try:
+            # Stages finished on an earlier attempt are not repeated
+            image_url = job.image_url or get_public_url_for_image(job)
+            if job.creation_id:
+                return {'success': True, 'image_url': image_url, 'creation_id': job.creation_id}
+
+            container_result = create_media_container(
+                image_url=image_url,
+                caption=job.caption,
+                access_token=job.access_token,
+                instagram_user_id=job.instagram_user_id
+            )
+            return dict(container_result, image_url=image_url)
+
+        except Exception as e:
+            logger.error(f"Exception when publishing post {job.id}: {str(e)}")
+            return {'success': False, 'error': str(e)}
+
+
+def _apply_result(post, account, result):
+    """Copy a staging result onto its Post without committing"""
+    post.account_id = account.id
+    post.image_url = result.get('image_url', post.image_url)
+    post.creation_id = result.get('creation_id', post.creation_id)
+
+    if result['success']:
+        # The container poller publishes it once Instagram has processed it
+        post.status = 'processing'
+        result['status'] = 'processing'
+    elif not result.get('rate_limited'):
+        # Rate-limited posts keep their status so they are picked up again later
+        post.status = 'failed'
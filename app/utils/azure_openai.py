@@ -0,0 +1,165 @@
+import os
+import asyncio
+import logging
+import threading
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_MESSAGES = {
+    'caption': "You are a social media expert who creates engaging Instagram captions.",
+    'hashtags': "You are a social media expert who creates relevant hashtags for Instagram posts."
+}
+
+
+def build_messages(prompt, content_type):
+    """Chat messages for one generation request"""
+    system_message = SYSTEM_MESSAGES['caption'] if content_type == 'caption' else SYSTEM_MESSAGES['hashtags']
+    return [
+        {"role": "system", "content": system_message},
+        {"role": "user", "content": prompt}
+    ]
+
+
+def _client_settings(config):
+    return {
+        'api_key': config['AZURE_OPENAI_API_KEY'],
+        'api_version': config['AZURE_OPENAI_API_VERSION'],
+        'azure_endpoint': config['AZURE_OPENAI_ENDPOINT'],
+        'timeout': config.get('AZURE_OPENAI_TIMEOUT', 30),
+        'max_retries': config.get('AZURE_OPENAI_MAX_RETRIES', 2)
+    }
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_azure_openai_client():
+    """
+    Return the process-wide AzureOpenAI client, creating it from app config
+    Reusing one client keeps its connection pool and TLS sessions alive
+    between calls; a new one is built after a fork
+    """
+    global _client, _client_pid
+
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            from openai import AzureOpenAI
+
+            _client = AzureOpenAI(**_client_settings(current_app.config))
+            _client_pid = os.getpid()
+        return _client
+
+
+class AsyncCompletionRunner:
+    """
+    Runs chat completions concurrently on a private event loop thread
+    The loop owns one AsyncAzureOpenAI client for the life of the process,
+    so callers on any thread share its connection pool. A semaphore caps
+    the requests in flight and every call has its own timeout.
+    """
+
+    def __init__(self, client_settings, max_concurrency=8):
+        self.max_concurrency = max_concurrency
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='azure-openai-loop', daemon=True)
+        self._thread.start()
+        asyncio.run_coroutine_threadsafe(self._setup(client_settings), self._loop).result()
+
+    async def _setup(self, client_settings):
+        from openai import AsyncAzureOpenAI
+
+        self._client = AsyncAzureOpenAI(**client_settings)
+        self._limit = asyncio.Semaphore(self.max_concurrency)
+
+    def complete_many(self, requests, model, timeout=30):
+        """
+        Run (messages, max_tokens) requests concurrently and wait for all of them
+        Returns the completion texts in request order, with None for failures
+        """
+        future = asyncio.run_coroutine_threadsafe(self._complete_all(requests, model, timeout), self._loop)
+        return future.result()
+
+    async def _complete_all(self, requests, model, timeout):
+        return await asyncio.gather(*(
+            self._complete(messages, max_tokens, model, timeout) for messages, max_tokens in requests
+        ))
+
+    async def _complete(self, messages, max_tokens, model, timeout):
+        async with self._limit:
+            try:
+                response = await asyncio.wait_for(
+                    self._client.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        max_tokens=max_tokens,
+                        temperature=0.7,
+                        timeout=timeout
+                    ),
+                    timeout
+                )
+                return response.choices[0].message.content.strip()
+            except Exception as e:
+                logger.error(f"Error generating content with Azure OpenAI: {str(e) or type(e).__name__}")
+                return None
+
+    def close(self):
+        asyncio.run_coroutine_threadsafe(self._client.close(), self._loop).result()
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+
+
+_runner = None
+_runner_pid = None
+_runner_lock = threading.Lock()
+
+
+def get_completion_runner():
+    """Return the process-wide async completion runner, creating it from app config"""
+    global _runner, _runner_pid
+
+    with _runner_lock:
+        if _runner is None or _runner_pid != os.getpid():
+            config = current_app.config
+            _runner = AsyncCompletionRunner(
+                _client_settings(config),
+                max_concurrency=config.get('AZURE_OPENAI_MAX_CONCURRENCY', 8)
+            )
+            _runner_pid = os.getpid()
+        return _runner
+
+
+def reset_azure_openai_clients():
+    """Close and drop the shared clients, e.g. after changing config"""
+    global _client, _client_pid, _runner, _runner_pid
+
+    with _client_lock:
+        if _client is not None and _client_pid == os.getpid():
+            _client.close()
+        _client = None
+        _client_pid = None
+
+    with _runner_lock:
+        if _runner is not None and _runner_pid == os.getpid():
+            _runner.close()
+        _runner = None
+        _runner_pid = None
+
+
+def stream_completion(prompt, content_type, max_tokens):
+    """Yield the completion for one prompt token by token as Azure streams it"""
+    config = current_app.config
+    stream = get_azure_openai_client().chat.completions.create(
+        model=config.get('AZURE_OPENAI_DEPLOYMENT', 'gpt-4'),
+        messages=build_messages(prompt, content_type),
+        max_tokens=max_tokens,
+        temperature=0.7,
+        stream=True
+    )
+
+    for chunk in stream:
+        # Azure sends content filter results as chunks without choices
+        if chunk.choices and chunk.choices[0].delta.content:
+            yield chunk.choices[0].delta.content
@@ -0,0 +1,132 @@
+import logging
+from datetime import datetime
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from app.models.models import Post
+from app.utils.instagram_publisher import apply_publish_result, get_container_statuses, publish_media
+from app.utils.credentials import credential_manager
+from app.utils.metrics import metrics_account
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Graph API accepts at most 50 ids per batched lookup
+MAX_IDS_PER_REQUEST = 50
+
+# Container states that can never be published
+DEAD_CONTAINER_STATES = {'ERROR', 'EXPIRED'}
+
+ReadyContainer = namedtuple('ReadyContainer', ['post_id', 'creation_id', 'access_token', 'instagram_user_id', 'account_id'])
+
+
+def poll_processing_containers(batch_size=None):
+    """
+    Check every 'processing' post's media container and publish the finished ones
+    Statuses are fetched in batched Graph requests per account. Finished
+    containers are published concurrently. Dead containers are cleared and
+    the post goes back to the draft buffer, so the next publish run creates
+    a fresh container from the already uploaded image; after
+    CONTAINER_MAX_ATTEMPTS dead containers the post is marked failed.
+    Containers already PUBLISHED (e.g. after a crash between media_publish
+    and the commit) only have their post marked published. Posts whose
+    account is inactive or gone are marked failed.
+    Returns counts of published, failed, retried and still processing posts
+    """
+    max_attempts = current_app.config.get('CONTAINER_MAX_ATTEMPTS', 3)
+    batch_size = min(batch_size or current_app.config.get('CONTAINER_STATUS_BATCH_SIZE', MAX_IDS_PER_REQUEST), MAX_IDS_PER_REQUEST)
+    counts = {'published': 0, 'failed': 0, 'retried': 0, 'processing': 0}
+
+    posts = Post.query.filter(
+        Post.status == 'processing',
+        Post.creation_id.isnot(None)
+    ).order_by(Post.scheduled_time).all()
+
+    if not posts:
+        return counts
+
+    accounts = {}
+    posts_by_account = {}
+    for post in posts:
+        account = credential_manager.get(post.account_id)
+        if account is None:
+            # Nobody can publish the container, so do not keep polling it
+            if post.account_id is None:
+                logger.error(f"Post {post.id} failed: no active Instagram account to publish container {post.creation_id}")
+            else:
+                logger.error(f"Post {post.id} failed: Instagram account {post.account_id} is inactive or deleted")
+            post.status = 'failed'
+            counts['failed'] += 1
+            continue
+        accounts[account.account_id] = account
+        posts_by_account.setdefault(account.account_id, []).append(post)
+
+    ready = []
+    for account_id, account_posts in posts_by_account.items():
+        account = accounts[account_id]
+
+        for start in range(0, len(account_posts), batch_size):
+            chunk = account_posts[start:start + batch_size]
+            result = get_container_statuses(
+                [post.creation_id for post in chunk],
+                account.access_token,
+                account.instagram_user_id
+            )
+
+            if not result['success']:
+                counts['processing'] += len(chunk)
+                continue
+
+            for post in chunk:
+                status_code = result['statuses'].get(post.creation_id)
+
+                if status_code == 'FINISHED':
+                    ready.append((post, ReadyContainer(post.id, post.creation_id, account.access_token, account.instagram_user_id, account_id)))
+                elif status_code == 'PUBLISHED':
+                    # Published by an earlier attempt that stopped before recording it
+                    logger.warning(f"Media container {post.creation_id} for post {post.id} was already published")
+                    post.status = 'published'
+                    post.published_time = datetime.utcnow()
+                    counts['published'] += 1
+                elif status_code in DEAD_CONTAINER_STATES:
+                    post.creation_id = None
+                    post.container_attempts = (post.container_attempts or 0) + 1
+                    if post.container_attempts < max_attempts:
+                        logger.warning(
+                            f"Media container for post {post.id} is {status_code}, "
+                            f"retrying with a new container (attempt {post.container_attempts + 1} of {max_attempts})"
+                        )
+                        post.status = 'draft'
+                        counts['retried'] += 1
+                    else:
+                        logger.error(f"Media container for post {post.id} is {status_code}, giving up after {max_attempts} attempts")
+                        post.status = 'failed'
+                        counts['failed'] += 1
+                else:
+                    counts['processing'] += 1
+
+    if ready:
+        app = current_app._get_current_object()
+        max_workers = min(len(ready), app.config.get('PUBLISH_MAX_CONCURRENCY', 16))
+
+        with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='container-publisher') as executor:
+            results = executor.map(lambda item: _publish_ready(app, item[1]), ready)
+
+            # Apply results on this thread so worker threads never touch the session
+            for (post, _), publish_result in zip(ready, results):
+                apply_publish_result(post, publish_result)
+                counts[post.status if post.status in counts else 'processing'] += 1
+                if publish_result['success']:
+                    logger.info(f"Successfully published post {post.id} to Instagram")
+
+    db.session.commit()
+    return counts
+
+
+def _publish_ready(app, container):
+    with app.app_context(), metrics_account(container.account_id):
+        return publish_media(
+            creation_id=container.creation_id,
+            access_token=container.access_token,
+            instagram_user_id=container.instagram_user_id
+        )
@@ -2,7 +2,11 @@ import os
 import logging
 import random
 from flask import current_app
-from app.models.models import ContentTemplate
+from app.utils.model_registry import model_registry
+from app.utils.template_index import template_index
+from app.utils.generation_cache import generation_key, get_generation_cache
+from app.utils.azure_openai import build_messages, get_azure_openai_client, get_completion_runner, stream_completion
+from app.utils.metrics import time_stage
 from datetime import datetime
 
 logger = logging.getLogger(__name__)
@@ -21,69 +25,91 @@ DEFAULT_TEMPLATES = {
     ]
 }
 
-def generate_caption_with_local_model(template_prompt, content_type):
+
+def get_max_length(content_type, max_length=None):
+    """Return the generation length limit for a content type unless one is given"""
+    if max_length:
+        return int(max_length)
+    return 150 if content_type == 'caption' else 50
+
+
+def generate_caption_with_local_model(template_prompt, content_type, max_length=None):
     """
     Generate content using a locally hosted model
-    This uses the transformers library for inference
+    This uses the transformers library for inference, with the pipeline
+    loaded once per process through the model registry
     """
-    try:
-        from transformers import pipeline
+    return generate_batch_with_local_model(
+        [template_prompt],
+        [get_max_length(content_type, max_length)]
+    )[0]
+
 
+def generate_batch_with_local_model(template_prompts, max_lengths):
+    """
+    Generate content for several prompts using the locally hosted model
+    Prompts sharing a max_length go through the pipeline as one padded batch
+    Returns a list aligned with template_prompts, with None for failures
+    """
+    results = [None] * len(template_prompts)
+    
+    try:
         # Load the model - adjust model_name based on your requirements
         model_name = current_app.config.get('CONTENT_GENERATION_MODEL', 'gpt-neo-125M')
+        device = current_app.config.get('CONTENT_GENERATION_DEVICE', -1)
         
-        # Initialize the text generation pipeline
-        generator = pipeline('text-generation', model=model_name)
+        # Reuse the resident text generation pipeline
+        generator = model_registry.get(model_name, device)
         
-        # Generate text based on the prompt
-        generated_text = generator(
-            template_prompt, 
-            max_length=150 if content_type == 'caption' else 50,
-            num_return_sequences=1,
-            temperature=0.7,
-            top_k=50,
-            top_p=0.95
-        )
+        # Decoder-only models need a pad token and left padding to batch prompts
+        tokenizer = generator.tokenizer
+        if tokenizer.pad_token_id is None:
+            tokenizer.pad_token_id = generator.model.config.eos_token_id
+        tokenizer.padding_side = 'left'
+        
+        # Group prompts by length limit so each group is a single inference pass
+        groups = {}
+        for index, max_length in enumerate(max_lengths):
+            groups.setdefault(max_length, []).append(index)
         
-        # Extract the generated text from the model output
-        return generated_text[0]['generated_text'].replace(template_prompt, '').strip()
+        for max_length, indexes in groups.items():
+            prompts = [template_prompts[i] for i in indexes]
+            
+            # Generate text based on the prompts
+            outputs = generator(
+                prompts,
+                batch_size=len(prompts),
+                max_length=max_length,
+                num_return_sequences=1,
+                temperature=0.7,
+                top_k=50,
+                top_p=0.95
+            )
+            
+            # Extract the generated text from the model output
+            for index, output in zip(indexes, outputs):
+                results[index] = output[0]['generated_text'].replace(template_prompts[index], '').strip()
     
     except Exception as e:
         logger.error(f"Error generating content with local model: {str(e)}")
-        return None
+    
+    return results
 
 
-def generate_caption_with_azure_openai(template_prompt, content_type):
+def generate_caption_with_azure_openai(template_prompt, content_type, max_length=None):
     """
     Generate content using Azure OpenAI Service
     This requires Azure OpenAI Service to be configured
     """
     try:
-        # Using the Azure OpenAI Python SDK
-        from openai import AzureOpenAI
-        
-        client = AzureOpenAI(
-            api_key=current_app.config['AZURE_OPENAI_API_KEY'],  
-            api_version=current_app.config['AZURE_OPENAI_API_VERSION'],
-            azure_endpoint=current_app.config['AZURE_OPENAI_ENDPOINT']
-        )
-        
-        # Prepare the prompt
-        if content_type == 'caption':
-            system_message = "You are a social media expert who creates engaging Instagram captions."
-            max_tokens = 150
-        else:  # hashtags
-            system_message = "You are a social media expert who creates relevant hashtags for Instagram posts."
-            max_tokens = 50
+        # Shared client, so connections are reused between calls
+        client = get_azure_openai_client()
         
         # Make the API call
         response = client.chat.completions.create(
-            model="gpt-4", # Adjust model based on availability
-            messages=[
-                {"role": "system", "content": system_message},
-                {"role": "user", "content": template_prompt}
-            ],
-            max_tokens=max_tokens,
+            model=current_app.config.get('AZURE_OPENAI_DEPLOYMENT', 'gpt-4'),
+            messages=build_messages(template_prompt, content_type),
+            max_tokens=get_max_length(content_type, max_length),
             temperature=0.7,
         )
         
@@ -94,52 +120,205 @@ def generate_caption_with_azure_openai(template_prompt, content_type):
         return None
 
 
-def generate_caption(content_type='caption', template_id=None):
+def generate_batch_with_azure_openai(template_prompts, content_types, max_lengths):
     """
-    Main function to generate content
-    Uses the specified template and model to generate content
-    Falls back to local options if Azure OpenAI is not available
+    Generate content for several prompts with concurrent Azure OpenAI requests
+    Requests run on the shared async client, at most AZURE_OPENAI_MAX_CONCURRENCY
+    at a time and each bounded by AZURE_OPENAI_TIMEOUT, so a batch takes
+    about as long as its slowest requests rather than the sum of all of them
+    Returns a list aligned with template_prompts, with None for failures
     """
     try:
-        # Get the template from the database
-        if template_id:
-            template = ContentTemplate.query.get(template_id)
-            if template and template.content_type == content_type:
-                template_prompt = template.prompt
-            else:
-                raise ValueError(f"Template with ID {template_id} not found or does not match content type {content_type}")
-        else:
-            # Get a random active template of the specified type
-            template = ContentTemplate.query.filter_by(
-                content_type=content_type, 
-                active=True
-            ).order_by(func.random()).first()
+        config = current_app.config
+        requests = [
+            (build_messages(prompt, content_type), get_max_length(content_type, max_length))
+            for prompt, content_type, max_length in zip(template_prompts, content_types, max_lengths)
+        ]
+        return get_completion_runner().complete_many(
+            requests,
+            config.get('AZURE_OPENAI_DEPLOYMENT', 'gpt-4'),
+            timeout=config.get('AZURE_OPENAI_TIMEOUT', 30)
+        )
+    except Exception as e:
+        logger.error(f"Error generating content with Azure OpenAI: {str(e)}")
+        return [None] * len(template_prompts)
+
+
+def get_template_prompts(content_requests):
+    """
+    Resolve the prompt for each content request from the in-memory template index
+    Returns a list aligned with content_requests, with None for invalid requests
+    """
+    # Add date and other context to the prompt
+    current_date = datetime.now().strftime("%B %d, %Y")
+    
+    prompts = []
+    with time_stage('template_fetch', 'index'):
+        for content_request in content_requests:
+            content_type = content_request['content_type']
+            template_id = content_request.get('template_id')
             
-            if template:
+            if template_id:
+                template = template_index.get(template_id)
+                if not template or template.content_type != content_type:
+                    logger.error(f"Template with ID {template_id} not found or does not match content type {content_type}")
+                    prompts.append(None)
+                    continue
                 template_prompt = template.prompt
             else:
-                # Fall back to default templates
-                template_prompt = random.choice(DEFAULT_TEMPLATES.get(content_type, ["Create engaging content for Instagram"]))
-        
-        # Add date and other context to the prompt
-        current_date = datetime.now().strftime("%B %d, %Y")
-        template_prompt = f"Date: {current_date}\nPrompt: {template_prompt}"
-        
-        # Try Azure OpenAI first if configured
-        if all(key in current_app.config for key in ['AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_API_VERSION']):
-            generated_content = generate_caption_with_azure_openai(template_prompt, content_type)
-            if generated_content:
-                return generated_content
-        
-        # Fall back to local model
-        generated_content = generate_caption_with_local_model(template_prompt, content_type)
-        if generated_content:
-            return generated_content
+                # Weighted random active template of the specified type
+                template = template_index.pick(content_type)
+                if template:
+                    template_prompt = template.prompt
+                else:
+                    # Fall back to default templates
+                    template_prompt = random.choice(DEFAULT_TEMPLATES.get(content_type, ["Create engaging content for Instagram"]))
+            
+            prompts.append(f"Date: {current_date}\nPrompt: {template_prompt}")
+    
+    return prompts
+
+
+def azure_openai_configured():
+    return all(key in current_app.config for key in ['AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_ENDPOINT', 'AZURE_OPENAI_API_VERSION'])
+
+
+def generate_uncached(content_requests, prompts, indexes):
+    """
+    Run inference for the given request indexes
+    Azure OpenAI requests run concurrently, local model requests run as a padded batch
+    Returns texts aligned with indexes, with None for failures
+    """
+    results = dict.fromkeys(indexes)
+    pending = list(indexes)
+    
+    # Try Azure OpenAI first if configured
+    if pending and azure_openai_configured():
+        with time_stage('inference', 'azure_openai'):
+            generated = generate_batch_with_azure_openai(
+                [prompts[i] for i in pending],
+                [content_requests[i]['content_type'] for i in pending],
+                [content_requests[i]['max_length'] for i in pending]
+            )
+        for index, content in zip(pending, generated):
+            results[index] = content
+        pending = [i for i in pending if not results[i]]
+    
+    # Fall back to local model
+    if pending:
+        with time_stage('inference', current_app.config.get('CONTENT_GENERATION_MODEL', 'gpt-neo-125M')):
+            generated = generate_batch_with_local_model(
+                [prompts[i] for i in pending],
+                [get_max_length(content_requests[i]['content_type'], content_requests[i]['max_length']) for i in pending]
+            )
+        for index, content in zip(pending, generated):
+            results[index] = content
+    
+    return [results[i] for i in indexes]
+
+
+def generate_contents(content_requests):
+    """
+    Generate content for several requests in one call
+    Each request is a dict with content_type and optional template_id and max_length
+    Requests go through the generation cache, so a template already
+    generated today is served from its pool of variants without inference,
+    and only the rest reach Azure OpenAI or the local model
+    Returns the generated strings in request order
+    """
+    content_requests = [
+        {
+            'content_type': r.get('content_type', 'caption'),
+            'template_id': r.get('template_id'),
+            'max_length': r.get('max_length')
+        }
+        for r in content_requests
+    ]
+    results = [None] * len(content_requests)
+    
+    try:
+        prompts = get_template_prompts(content_requests)
+        pending = [i for i, prompt in enumerate(prompts) if prompt]
+        cache = get_generation_cache()
         
-        # If all else fails, use a default template
-        return random.choice(DEFAULT_TEMPLATES.get(content_type, ["Check out this amazing content!"]))
+        if cache is None:
+            for index, content in zip(pending, generate_uncached(content_requests, prompts, pending)):
+                results[index] = content
+        else:
+            model = 'azure-openai' if azure_openai_configured() else current_app.config.get('CONTENT_GENERATION_MODEL', 'gpt-neo-125M')
+            keys = [
+                generation_key(
+                    model,
+                    r['content_type'],
+                    prompt,
+                    get_max_length(r['content_type'], r['max_length'])
+                ) if prompt else None
+                for r, prompt in zip(content_requests, prompts)
+            ]
+            results = cache.get_or_generate(
+                keys,
+                lambda indexes: generate_uncached(content_requests, prompts, indexes)
+            )
     
     except Exception as e:
-        logger.error(f"Error in generate_caption: {str(e)}")
-        # Return a safe default in case of error
-        return random.choice(DEFAULT_TEMPLATES.get(content_type, ["Check out this amazing content!"]))
\ No newline at end of file
+        logger.error(f"Error in generate_contents: {str(e)}")
+    
+    # If all else fails, use a default template
+    return [
+        content or random.choice(DEFAULT_TEMPLATES.get(r['content_type'], ["Check out this amazing content!"]))
+        for content, r in zip(results, content_requests)
+    ]
+
+
+def generate_post_contents(count=1):
+    """
+    Generate caption and hashtags for several posts in one batched call
+    Returns a list of dicts with caption and hashtags keys
+    """
+    content_requests = []
+    for _ in range(count):
+        content_requests.append({'content_type': 'caption'})
+        content_requests.append({'content_type': 'hashtags'})
+    
+    generated = generate_contents(content_requests)
+    return [
+        {'caption': generated[i], 'hashtags': generated[i + 1]}
+        for i in range(0, len(generated), 2)
+    ]
+
+
+def generate_caption(content_type='caption', template_id=None, max_length=None):
+    """
+    Main function to generate content
+    Uses the specified template and model to generate content
+    Falls back to local options if Azure OpenAI is not available
+    """
+    return generate_contents([{
+        'content_type': content_type,
+        'template_id': template_id,
+        'max_length': max_length
+    }])[0]
+
+
+def stream_content(content_type='caption', template_id=None, max_length=None):
+    """
+    Generate content for one request, yielding text as it is produced
+    Azure OpenAI output is streamed token by token; the local model does not
+    stream, so its whole result is yielded at once
+    """
+    content_request = {'content_type': content_type, 'template_id': template_id, 'max_length': max_length}
+    prompt = get_template_prompts([content_request])[0]
+    
+    if prompt and azure_openai_configured():
+        streamed = False
+        try:
+            for token in stream_completion(prompt, content_type, get_max_length(content_type, max_length)):
+                streamed = True
+                yield token
+            return
+        except Exception as e:
+            logger.error(f"Error streaming content from Azure OpenAI: {str(e)}")
+            if streamed:
+                return
+    
+    yield generate_caption(content_type, template_id, max_length)
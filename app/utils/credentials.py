@@ -0,0 +1,211 @@
+import time
+import logging
+import threading
+from collections import namedtuple
+from datetime import datetime, timedelta
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from app.models.models import InstagramAccount
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+class Credentials(namedtuple('Credentials', [
+    'account_id', 'account_name', 'instagram_user_id', 'access_token', 'token_expires_at'
+])):
+    """Plain snapshot of an active account's credentials, safe to share across threads"""
+
+    def is_expired(self, now=None):
+        return self.token_expires_at is not None and self.token_expires_at <= (now or datetime.utcnow())
+
+    def expires_within(self, margin, now=None):
+        """True if the token expires within margin; tokens with an unknown expiry are never refreshed"""
+        return self.token_expires_at is not None and self.token_expires_at <= (now or datetime.utcnow()) + margin
+
+
+class CredentialManager:
+    """
+    In-memory cache of active Instagram accounts and their access tokens
+    Lookups on the publish path are served from memory. Tokens nearing
+    expiry are refreshed on a background thread, so publishing keeps using
+    the still-valid token meanwhile; only an already expired token is
+    refreshed inline. A per-account lock makes every refresh single-flight:
+    concurrent callers wait for the refresh in progress instead of
+    starting their own. After a failed refresh an account is not retried
+    for retry_seconds, so a broken token does not cost an OAuth exchange
+    on every publish.
+    The cache is dropped whenever an account is written in this process
+    and reloaded after cache_seconds to pick up changes made elsewhere.
+    """
+
+    def __init__(self, refresh_margin=timedelta(days=7), cache_seconds=300, retry_seconds=900):
+        self.refresh_margin = refresh_margin
+        self.cache_seconds = cache_seconds
+        self.retry_seconds = retry_seconds
+        self._app = None
+        self._accounts = None
+        self._loaded_at = 0
+        self._lock = threading.Lock()
+        self._refresh_locks = {}
+        self._refreshing = set()
+        self._failed_at = {}
+
+    def init_app(self, app):
+        self._app = app
+        self.refresh_margin = timedelta(days=app.config.get('TOKEN_REFRESH_MARGIN_DAYS', 7))
+        self.cache_seconds = app.config.get('CREDENTIAL_CACHE_SECONDS', 300)
+        self.retry_seconds = app.config.get('TOKEN_REFRESH_RETRY_SECONDS', 900)
+
+    def get(self, account_id=None):
+        """
+        Credentials for an active account, or the default (first active)
+        account when account_id is None. Returns None if there is no such
+        active account; check is_expired() if an inline refresh failed or
+        the account is backing off after a failure
+        """
+        credentials = self._lookup(account_id)
+        if credentials is None:
+            return None
+
+        if credentials.is_expired():
+            return self.refresh(credentials.account_id)
+        if credentials.expires_within(self.refresh_margin):
+            self.refresh_async(credentials.account_id)
+        return credentials
+
+    def refresh(self, account_id, app=None):
+        """
+        Refresh an account's token now, or wait for the refresh already in flight
+        The account is re-read first, so a token renewed by another thread
+        or process meanwhile is picked up rather than refreshed again.
+        Returns the account's current Credentials, or None if it is gone
+        """
+        from app.utils.instagram_publisher import refresh_long_lived_token
+
+        with self._refresh_lock(account_id):
+            # Own app context and session, so the caller's session is never committed
+            with (app or self._get_app()).app_context():
+                account = db.session.get(InstagramAccount, account_id)
+                if account is None or not account.active:
+                    self.invalidate()
+                    return None
+
+                if self._snapshot(account).expires_within(self.refresh_margin) and not self._backing_off(account_id):
+                    if refresh_long_lived_token(account):
+                        logger.info(f"Refreshed access token for account {account_id}")
+                        with self._lock:
+                            self._failed_at.pop(account_id, None)
+                    else:
+                        logger.error(
+                            f"Could not refresh access token for account {account_id}, "
+                            f"retrying in {self.retry_seconds}s"
+                        )
+                        with self._lock:
+                            self._failed_at[account_id] = time.monotonic()
+
+                credentials = self._snapshot(account)
+
+            with self._lock:
+                if self._accounts is not None:
+                    self._accounts[account_id] = credentials
+            return credentials
+
+    def refresh_async(self, account_id):
+        """Start a background refresh unless one is already running or recently failed for the account"""
+        if self._backing_off(account_id):
+            return
+        with self._lock:
+            if account_id in self._refreshing:
+                return
+            self._refreshing.add(account_id)
+
+        threading.Thread(
+            target=self._refresh_in_background,
+            args=(self._get_app(), account_id),
+            name=f"token-refresh-{account_id}",
+            daemon=True
+        ).start()
+
+    def refresh_expiring(self):
+        """Refresh every active account whose token expires within the margin; returns the count"""
+        refreshed = 0
+        for credentials in list(self._active().values()):
+            if credentials.expires_within(self.refresh_margin) and not self._backing_off(credentials.account_id):
+                self.refresh(credentials.account_id)
+                refreshed += 1
+        return refreshed
+
+    def invalidate(self):
+        """Drop the cache; the next lookup reloads accounts from the database"""
+        with self._lock:
+            self._accounts = None
+
+    def _lookup(self, account_id):
+        accounts = self._active()
+        if account_id is None:
+            return accounts[min(accounts)] if accounts else None
+        return accounts.get(account_id)
+
+    def _active(self):
+        with self._lock:
+            accounts = self._accounts
+            fresh = accounts is not None and time.monotonic() - self._loaded_at < self.cache_seconds
+        if fresh:
+            return accounts
+
+        accounts = {account.id: self._snapshot(account) for account in InstagramAccount.query.filter_by(active=True)}
+        with self._lock:
+            self._accounts = accounts
+            self._loaded_at = time.monotonic()
+        return accounts
+
+    def _refresh_in_background(self, app, account_id):
+        try:
+            self.refresh(account_id, app)
+        except Exception as e:
+            logger.error(f"Background token refresh for account {account_id} failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing.discard(account_id)
+
+    def _backing_off(self, account_id):
+        with self._lock:
+            failed_at = self._failed_at.get(account_id)
+        return failed_at is not None and time.monotonic() - failed_at < self.retry_seconds
+
+    def _refresh_lock(self, account_id):
+        with self._lock:
+            return self._refresh_locks.setdefault(account_id, threading.Lock())
+
+    def _get_app(self):
+        if has_app_context():
+            return current_app._get_current_object()
+        return self._app
+
+    @staticmethod
+    def _snapshot(account):
+        return Credentials(
+            account.id, account.account_name, account.instagram_user_id,
+            account.access_token, account.token_expires_at
+        )
+
+
+# Shared by every thread in this process
+credential_manager = CredentialManager()
+
+
+def _invalidate_credentials(mapper, connection, target):
+    credential_manager.invalidate()
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(InstagramAccount, _event_name, _invalidate_credentials)
+
+
+def refresh_expiring_tokens():
+    """Periodic job: renew tokens before they expire so publishing never has to"""
+    refreshed = credential_manager.refresh_expiring()
+    if refreshed:
+        logger.info(f"Checked {refreshed} expiring access tokens")
+    return refreshed
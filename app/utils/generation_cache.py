@@ -0,0 +1,221 @@
+import os
+import json
+import time
+import random
+import sqlite3
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+
+def generation_key(model, content_type, prompt, max_length):
+    """
+    Cache key for one generation request
+    The prompt already carries the template text and the date, so the key
+    covers (model, template, content type, date, parameters)
+    """
+    raw = json.dumps([model, content_type, prompt, max_length])
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class GenerationCache:
+    """
+    Pool of up to `variants` generated texts per key, kept for ttl seconds
+    Until a key's pool is full, requests generate a new variant and add it;
+    after that they are served a random variant without any inference.
+    Keys live in an in-memory LRU of max_keys and, when path is set, in a
+    SQLite file shared by every process. Identical requests already being
+    generated by another thread are waited on instead of repeated.
+    """
+
+    def __init__(self, variants=3, ttl=86400, max_keys=1024, path=None):
+        self.variants = variants
+        self.ttl = ttl
+        self.max_keys = max_keys
+        self.path = path
+        self._memory = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self._db = None
+        self._db_lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+
+        if path:
+            self._open_db(path)
+
+    def get_or_generate(self, keys, generate):
+        """
+        Resolve a batch of requests through the cache
+        keys is aligned with the requests, None for requests to skip.
+        generate(indexes) must return fresh texts for those request indexes
+        in one batched call, with None for failures.
+        Returns a list aligned with keys, None where nothing is available
+        """
+        results = [None] * len(keys)
+        by_key = OrderedDict()
+        for index, key in enumerate(keys):
+            if key is not None:
+                by_key.setdefault(key, []).append(index)
+
+        to_generate, owned, waiting = [], [], []
+        with self._lock:
+            for key, indexes in by_key.items():
+                pool = self._pool(key)
+                if key in self._inflight:
+                    # Someone else is generating this key; use what exists or wait for it
+                    self.coalesced += len(indexes)
+                    if not pool:
+                        waiting.append((key, self._inflight[key]))
+                    continue
+
+                count = min(len(indexes), self.variants - len(pool))
+                if count > 0:
+                    to_generate.extend(indexes[:count])
+                    owned.append(key)
+                    self._inflight[key] = threading.Event()
+                self.misses += max(count, 0)
+                self.hits += len(indexes) - max(count, 0)
+
+        try:
+            generated = generate(to_generate) if to_generate else []
+            for index, text in zip(to_generate, generated):
+                if text:
+                    results[index] = text
+                    self._add(keys[index], text)
+        finally:
+            with self._lock:
+                for key in owned:
+                    self._inflight.pop(key).set()
+
+        for _, event in waiting:
+            event.wait()
+
+        with self._lock:
+            for key, indexes in by_key.items():
+                pool = self._pool(key)
+                for index in indexes:
+                    if results[index] is None and pool:
+                        results[index] = random.choice(pool)
+
+        return results
+
+    def stats(self):
+        with self._lock:
+            return {
+                'keys': len(self._memory),
+                'variants_per_key': self.variants,
+                'hits': self.hits,
+                'misses': self.misses,
+                'coalesced': self.coalesced,
+                'disk': self.path
+            }
+
+    def clear(self):
+        with self._lock:
+            self._memory.clear()
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute("DELETE FROM generation_variant")
+
+    def _pool(self, key):
+        """Unexpired variants for a key, from memory or the disk tier; call with the lock held"""
+        cutoff = time.time() - self.ttl
+        entry = self._memory.get(key)
+
+        if entry is None and self._db is not None:
+            entry = self._load(key, cutoff)
+            if entry:
+                self._remember(key, entry)
+
+        if not entry:
+            return []
+
+        entry[:] = [variant for variant in entry if variant[1] >= cutoff]
+        self._memory.move_to_end(key)
+        return [text for text, _ in entry]
+
+    def _add(self, key, text):
+        created_at = time.time()
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                entry = []
+                self._remember(key, entry)
+            entry.append((text, created_at))
+
+        if self._db is not None:
+            with self._db_lock:
+                self._db.execute(
+                    "INSERT INTO generation_variant (key, content, created_at) VALUES (?, ?, ?)",
+                    (key, text, created_at)
+                )
+
+    def _remember(self, key, entry):
+        self._memory[key] = entry
+        self._memory.move_to_end(key)
+        while len(self._memory) > self.max_keys:
+            self._memory.popitem(last=False)
+
+    def _open_db(self, path):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS generation_variant "
+            "(key TEXT NOT NULL, content TEXT NOT NULL, created_at REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS ix_generation_variant_key ON generation_variant (key, created_at)")
+        self._db.execute("DELETE FROM generation_variant WHERE created_at < ?", (time.time() - self.ttl,))
+
+    def _load(self, key, cutoff):
+        with self._db_lock:
+            rows = self._db.execute(
+                "SELECT content, created_at FROM generation_variant WHERE key = ? AND created_at >= ? "
+                "ORDER BY created_at LIMIT ?",
+                (key, cutoff, self.variants)
+            ).fetchall()
+        return [(content, created_at) for content, created_at in rows]
+
+
+_cache = None
+_cache_pid = None
+_cache_lock = threading.Lock()
+
+
+def get_generation_cache():
+    """
+    Return the process-wide generation cache built from app config, or None
+    when GENERATION_CACHE_VARIANTS is 0. Rebuilt after a fork so processes
+    never share a SQLite connection
+    """
+    global _cache, _cache_pid
+
+    config = current_app.config
+    if not config.get('GENERATION_CACHE_VARIANTS', 3):
+        return None
+
+    with _cache_lock:
+        if _cache is None or _cache_pid != os.getpid():
+            _cache = GenerationCache(
+                variants=config.get('GENERATION_CACHE_VARIANTS', 3),
+                ttl=config.get('GENERATION_CACHE_TTL_SECONDS', 86400),
+                max_keys=config.get('GENERATION_CACHE_MAX_KEYS', 1024),
+                path=config.get('GENERATION_CACHE_PATH') or None
+            )
+            _cache_pid = os.getpid()
+        return _cache
+
+
+def reset_generation_cache():
+    """Drop the shared cache, e.g. after changing config"""
+    global _cache, _cache_pid
+
+    with _cache_lock:
+        _cache = None
+        _cache_pid = None
@@ -0,0 +1,134 @@
+import os
+import time
+import random
+import logging
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from flask import current_app
+from app.utils.rate_limiter import get_governor
+
+logger = logging.getLogger(__name__)
+
+# Graph API error codes documented as temporary and safe to retry
+TRANSIENT_ERROR_CODES = {1, 2, 4, 17, 32, 341, 613}
+
+
+class GraphAPIClient:
+    """
+    Shared client for the Instagram Graph API
+    Keeps a pooled keep-alive requests.Session, applies a timeout to every
+    call and retries idempotent calls with jittered exponential backoff
+    When a governor is set, every call first waits for rate-limit budget
+    """
+
+    def __init__(self, base_url, pool_size=10, connect_timeout=5, read_timeout=30,
+                 max_retries=3, backoff=0.5, backoff_cap=8, governor=None):
+        self.base_url = base_url.rstrip('/')
+        self.governor = governor
+        self.timeout = (connect_timeout, read_timeout)
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.backoff_cap = backoff_cap
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=0)
+        self.session.mount('https://', adapter)
+        self.session.mount('http://', adapter)
+
+    def get(self, path, params=None, account_key=None):
+        """GET a Graph API path, retrying transient failures"""
+        return self.request('GET', path, params=params, idempotent=True, account_key=account_key)
+
+    def post(self, path, params=None, idempotent=False, account_key=None):
+        """POST to a Graph API path, retrying transient failures only if idempotent"""
+        return self.request('POST', path, params=params, idempotent=idempotent, account_key=account_key)
+
+    def request(self, method, path, params=None, idempotent=False, account_key=None):
+        """
+        Send a request and return the requests.Response
+        Connection errors, timeouts, 429/5xx responses and transient Graph
+        errors are retried up to max_retries times for idempotent calls
+        account_key selects the per-account rate-limit budget; the governor
+        raises RateLimitExceeded if no budget frees up in time
+        """
+        url = f"{self.base_url}/{path.lstrip('/')}"
+        attempts = self.max_retries + 1 if idempotent else 1
+
+        for attempt in range(attempts):
+            last_attempt = attempt == attempts - 1
+            if self.governor:
+                self.governor.acquire(account_key)
+            try:
+                response = self.session.request(method, url, params=params, timeout=self.timeout)
+                if self.governor:
+                    self.governor.record_response(account_key, response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                if last_attempt:
+                    raise
+                logger.warning(f"Graph API {method} {path} failed ({str(e)}), retrying")
+            else:
+                if last_attempt or not _is_retryable(response):
+                    return response
+                logger.warning(f"Graph API {method} {path} returned {response.status_code}, retrying")
+
+            time.sleep(self._backoff_delay(attempt))
+
+    def close(self):
+        self.session.close()
+
+    def _backoff_delay(self, attempt):
+        # Full jitter keeps concurrent retries from synchronising
+        return random.uniform(0, min(self.backoff_cap, self.backoff * (2 ** attempt)))
+
+
+def _is_retryable(response):
+    """Check whether a response signals a temporary failure"""
+    if response.status_code == 429 or response.status_code >= 500:
+        return True
+
+    try:
+        error = response.json().get('error', {})
+    except ValueError:
+        return False
+
+    return bool(error.get('is_transient')) or error.get('code') in TRANSIENT_ERROR_CODES
+
+
+_client = None
+_client_pid = None
+_client_lock = threading.Lock()
+
+
+def get_graph_client():
+    """
+    Return the process-wide Graph API client, creating it from app config
+    A new client is built after a fork so processes never share sockets
+    """
+    global _client, _client_pid
+
+    with _client_lock:
+        if _client is None or _client_pid != os.getpid():
+            config = current_app.config
+            _client = GraphAPIClient(
+                config['INSTAGRAM_GRAPH_API_URL'],
+                pool_size=config.get('GRAPH_API_POOL_SIZE', 10),
+                connect_timeout=config.get('GRAPH_API_CONNECT_TIMEOUT', 5),
+                read_timeout=config.get('GRAPH_API_READ_TIMEOUT', 30),
+                max_retries=config.get('GRAPH_API_MAX_RETRIES', 3),
+                backoff=config.get('GRAPH_API_BACKOFF', 0.5),
+                governor=get_governor(config)
+            )
+            _client_pid = os.getpid()
+        return _client
+
+
+def reset_graph_client():
+    """Close and drop the shared client, e.g. after changing config"""
+    global _client, _client_pid
+
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+        _client = None
+        _client_pid = None
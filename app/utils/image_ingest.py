@@ -0,0 +1,179 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+# Bump when normalize_image changes, so older derivatives are not reused
+DERIVATIVE_VERSION = 2
+
+# Read size used when hashing source files
+CHUNK_SIZE = 1024 * 1024
+
+# Age after which a temporary derivative is treated as abandoned by a crashed render
+PARTIAL_MAX_AGE_SECONDS = 600
+
+# Content digests of source files, keyed by (path, size, mtime), least recently used first
+MAX_DIGESTS = 4096
+_digests = OrderedDict()
+_digests_lock = threading.Lock()
+
+
+def normalize_image(path, size=(1080, 1080)):
+    """
+    Decode a source image at close to the target size and crop it to fill size
+    JPEGs are decoded with Image.draft at the smallest 1/2, 1/4 or 1/8 scale
+    still covering the target, so a 12 MP photo never exists in memory at
+    full resolution. Other formats are reduced by an integer factor before
+    the final resample. The centre of the image is cropped to the target
+    aspect ratio rather than stretched, after applying the EXIF orientation.
+    Returns an RGB image of exactly size
+    """
+    from PIL import Image, ImageOps
+
+    width, height = size
+    with Image.open(path) as source:
+        # Phone photos are stored sideways with an orientation tag
+        orientation = source.getexif().get(0x0112, 1)
+        if source.format == 'JPEG':
+            source.draft('RGB', (height, width) if orientation in (5, 6, 7, 8) else (width, height))
+        img = ImageOps.exif_transpose(source)
+
+    if img.mode != 'RGB':
+        img = img.convert('RGB')
+
+    # Largest centred box with the target aspect ratio
+    scale = min(img.width / width, img.height / height)
+    crop_width, crop_height = width * scale, height * scale
+    left, top = (img.width - crop_width) / 2, (img.height - crop_height) / 2
+    box = (left, top, left + crop_width, top + crop_height)
+
+    # reducing_gap shrinks with a cheap integer reduce() first, then resamples the rest
+    return img.resize(size, Image.LANCZOS, box=box, reducing_gap=2.0)
+
+
+def source_digest(path):
+    """SHA-256 of a source file's content, cached by path, size and mtime"""
+    stat = os.stat(path)
+    key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+    with _digests_lock:
+        digest = _digests.get(key)
+        if digest:
+            _digests.move_to_end(key)
+            return digest
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+
+    with _digests_lock:
+        _digests[key] = digest
+        if len(_digests) > MAX_DIGESTS:
+            _digests.popitem(last=False)
+    return digest
+
+
+def load_source_image(path, size=(1080, 1080), cache_folder=None):
+    """
+    Normalized size x size version of a user-supplied source image
+    With cache_folder set, derivatives are stored there as lossless PNGs named
+    by the source content hash, so a source reused across posts (or copied
+    to another path) is decoded only once. Edited sources get a new hash;
+    the hash itself is recomputed only when a file's size or mtime changes.
+    Lossless storage keeps cached renders identical to uncached ones, since
+    the rendered post is JPEG-encoded anyway
+    """
+    from PIL import Image
+
+    if not cache_folder:
+        return normalize_image(path, size)
+
+    cached_path = os.path.join(
+        cache_folder,
+        f"{source_digest(path)}_{size[0]}x{size[1]}_v{DERIVATIVE_VERSION}.png"
+    )
+
+    if os.path.exists(cached_path):
+        try:
+            with Image.open(cached_path) as cached:
+                img = cached.convert('RGB')
+            # Mark as recently used for prune_image_cache
+            os.utime(cached_path)
+            return img
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable cached derivative {cached_path}: {str(e)}")
+
+    img = normalize_image(path, size)
+
+    try:
+        os.makedirs(cache_folder, exist_ok=True)
+        # Write under a temporary name so concurrent renders never read half a file
+        partial = f"{cached_path}.{os.getpid()}.{threading.get_ident()}.part"
+        # Fastest zlib level: larger files, but the encode cost is paid on a miss
+        img.save(partial, format='PNG', compress_level=1)
+        os.replace(partial, cached_path)
+    except OSError as e:
+        logger.warning(f"Could not cache derivative of {path}: {str(e)}")
+
+    return img
+
+
+def prune_image_cache(cache_folder=None, max_bytes=None):
+    """
+    Periodic job: delete the least recently used derivatives above max_bytes
+    Temporary files left behind by renders that died mid-write are removed
+    once they are older than PARTIAL_MAX_AGE_SECONDS. Defaults to
+    IMAGE_CACHE_DIR and IMAGE_CACHE_MAX_MB. Returns the number of files removed
+    """
+    if cache_folder is None:
+        cache_folder = current_app.config.get('IMAGE_CACHE_DIR')
+    if max_bytes is None:
+        max_bytes = current_app.config.get('IMAGE_CACHE_MAX_MB', 1024) * 1024 * 1024
+    if not cache_folder or not os.path.isdir(cache_folder):
+        return 0
+
+    now = time.time()
+    entries = []
+    total = 0
+    removed = 0
+    for entry in os.scandir(cache_folder):
+        if not entry.is_file():
+            continue
+        stat = entry.stat()
+        if entry.name.endswith('.part'):
+            if now - stat.st_mtime > PARTIAL_MAX_AGE_SECONDS:
+                if _remove(entry.path):
+                    removed += 1
+            else:
+                # Still being written: counts against the budget but is never deleted
+                total += stat.st_size
+            continue
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total += stat.st_size
+
+    for _, size, path in sorted(entries):
+        if total <= max_bytes:
+            break
+        if _remove(path):
+            removed += 1
+        total -= size
+
+    if removed:
+        logger.info(f"Pruned {removed} cached image derivatives from {cache_folder}")
+    return removed
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+        return True
+    except FileNotFoundError:
+        # Already pruned by another process
+        return False
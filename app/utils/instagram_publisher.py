@@ -1,9 +1,12 @@
 import os
-import requests
 import logging
 from datetime import datetime, timedelta
 from flask import current_app
-from app.models.models import Post, InstagramAccount
+from app.models.models import Post
+from app.utils.graph_client import get_graph_client
+from app.utils.storage import get_storage
+from app.utils.rate_limiter import RateLimitExceeded, is_rate_limit_error
+from app.utils.metrics import metrics_account, time_stage
 from app import db
 
 logger = logging.getLogger(__name__)
@@ -13,7 +16,7 @@ def create_media_container(image_url, caption, access_token, instagram_user_id):
     Step 1: Create a media container on Instagram
     Returns the creation_id of the container
     """
-    api_url = f"{current_app.config['INSTAGRAM_GRAPH_API_URL']}/{instagram_user_id}/media"
+    api_path = f"{instagram_user_id}/media"
     
     params = {
         "image_url": image_url,
@@ -22,7 +25,9 @@ def create_media_container(image_url, caption, access_token, instagram_user_id):
     }
     
     try:
-        response = requests.post(api_url, params=params)
+        # Unpublished duplicate containers expire on their own, so retrying is safe
+        with time_stage('container_create', 'graph_api'):
+            response = get_graph_client().post(api_path, params=params, idempotent=True, account_key=instagram_user_id)
         response_data = response.json()
         
         if 'id' in response_data:
@@ -30,7 +35,11 @@ def create_media_container(image_url, caption, access_token, instagram_user_id):
         else:
             error_message = response_data.get('error', {}).get('message', 'Unknown error')
             logger.error(f"Failed to create media container: {error_message}")
-            return {'success': False, 'error': error_message}
+            return {'success': False, 'error': error_message, 'rate_limited': is_rate_limit_error(response)}
+    
+    except RateLimitExceeded as e:
+        logger.warning(f"Deferred media container creation: {str(e)}")
+        return {'success': False, 'error': str(e), 'rate_limited': True, 'retry_after': e.retry_after}
     
     except Exception as e:
         logger.error(f"Exception when creating media container: {str(e)}")
@@ -42,7 +51,7 @@ def publish_media(creation_id, access_token, instagram_user_id):
     Step 2: Publish the media container to Instagram
     Returns the Instagram post ID
     """
-    api_url = f"{current_app.config['INSTAGRAM_GRAPH_API_URL']}/{instagram_user_id}/media_publish"
+    api_path = f"{instagram_user_id}/media_publish"
     
     params = {
         "creation_id": creation_id,
@@ -50,7 +59,8 @@ def publish_media(creation_id, access_token, instagram_user_id):
     }
     
     try:
-        response = requests.post(api_url, params=params)
+        with time_stage('publish', 'graph_api'):
+            response = get_graph_client().post(api_path, params=params, account_key=instagram_user_id)
         response_data = response.json()
         
         if 'id' in response_data:
@@ -58,7 +68,11 @@ def publish_media(creation_id, access_token, instagram_user_id):
         else:
             error_message = response_data.get('error', {}).get('message', 'Unknown error')
             logger.error(f"Failed to publish media: {error_message}")
-            return {'success': False, 'error': error_message}
+            return {'success': False, 'error': error_message, 'rate_limited': is_rate_limit_error(response)}
+    
+    except RateLimitExceeded as e:
+        logger.warning(f"Deferred media publish: {str(e)}")
+        return {'success': False, 'error': str(e), 'rate_limited': True, 'retry_after': e.retry_after}
     
     except Exception as e:
         logger.error(f"Exception when publishing media: {str(e)}")
@@ -68,45 +82,18 @@ def publish_media(creation_id, access_token, instagram_user_id):
 def get_public_url_for_image(post):
     """
     Generate a publicly accessible URL for the image
-    For production, this would use Azure Blob Storage
-    For local development, we'll use a placeholder technique
+    Uses the configured storage backend (Azure Blob Storage in production,
+    a local static directory otherwise). Blobs are named by content hash,
+    so an image that was already uploaded is not uploaded again.
     """
-    if current_app.config.get('AZURE_STORAGE_CONNECTION_STRING'):
-        # In production, use Azure Blob Storage
-        from azure.storage.blob import BlobServiceClient, ContentSettings
-        
-        blob_service_client = BlobServiceClient.from_connection_string(
-            current_app.config['AZURE_STORAGE_CONNECTION_STRING']
-        )
-        container_client = blob_service_client.get_container_client(
-            current_app.config['AZURE_STORAGE_CONTAINER']
-        )
-        
-        # Generate a unique blob name
-        blob_name = f"post_{post.id}_{datetime.utcnow().strftime('%Y%m%d%H%M%S')}.jpg"
-        
-        # Upload the image to Azure Blob Storage
-        with open(post.image_path, "rb") as data:
-            container_client.upload_blob(
-                name=blob_name,
-                data=data,
-                content_settings=ContentSettings(content_type="image/jpeg")
-            )
-        
-        # Get the public URL for the image
-        return f"{container_client.primary_endpoint}/{blob_name}"
-    else:
-        # For local development: You would need to configure ngrok or a similar service
-        # to expose your local files to the public internet
-        # This is a placeholder - you'd need to implement a real solution
-        return "https://placekitten.com/800/800"  # Placeholder image URL for testing
+    return get_storage().url_for_file(post.image_path)
 
 
 def refresh_long_lived_token(account):
     """
     Refresh a long-lived access token before it expires
     """
-    api_url = f"{current_app.config['INSTAGRAM_GRAPH_API_URL']}/oauth/access_token"
+    api_path = "oauth/access_token"
     
     params = {
         "grant_type": "fb_exchange_token",
@@ -116,7 +103,7 @@ def refresh_long_lived_token(account):
     }
     
     try:
-        response = requests.post(api_url, params=params)
+        response = get_graph_client().post(api_path, params=params, idempotent=True)
         response_data = response.json()
         
         if 'access_token' in response_data:
@@ -134,65 +121,107 @@ def refresh_long_lived_token(account):
         return False
 
 
-def publish_to_instagram(post):
+def get_container_statuses(creation_ids, access_token, instagram_user_id):
     """
-    Main function to publish a post to Instagram
-    Takes a Post object and handles the full publishing process
+    Look up the processing status of several media containers in one Graph request
+    Returns a mapping of creation_id to status_code (IN_PROGRESS, FINISHED, ERROR, EXPIRED, PUBLISHED)
     """
-    # Get an active Instagram account
-    account = InstagramAccount.query.filter_by(active=True).first()
+    params = {
+        "ids": ",".join(creation_ids),
+        "fields": "status_code",
+        "access_token": access_token
+    }
     
-    if not account:
-        return {'success': False, 'error': 'No active Instagram account found'}
+    try:
+        response = get_graph_client().get("", params=params, account_key=instagram_user_id)
+        response_data = response.json()
+        
+        if 'error' in response_data:
+            error_message = response_data['error'].get('message', 'Unknown error')
+            logger.error(f"Failed to fetch container statuses: {error_message}")
+            return {'success': False, 'error': error_message, 'rate_limited': is_rate_limit_error(response)}
+        
+        return {
+            'success': True,
+            'statuses': {creation_id: data.get('status_code') for creation_id, data in response_data.items()}
+        }
     
-    # Check if token needs refreshing
-    if not account.is_token_valid():
-        refresh_success = refresh_long_lived_token(account)
-        if not refresh_success:
-            return {'success': False, 'error': 'Failed to refresh access token'}
-    
-    # Get public URL for the image
-    image_url = get_public_url_for_image(post)
-    post.image_url = image_url
-    
-    # Create media container
-    container_result = create_media_container(
-        image_url=image_url,
-        caption=post.caption,
-        access_token=account.access_token,
-        instagram_user_id=account.instagram_user_id
-    )
-    
-    if not container_result['success']:
+    except RateLimitExceeded as e:
+        logger.warning(f"Deferred container status check: {str(e)}")
+        return {'success': False, 'error': str(e), 'rate_limited': True, 'retry_after': e.retry_after}
+    
+    except Exception as e:
+        logger.error(f"Exception when fetching container statuses: {str(e)}")
+        return {'success': False, 'error': str(e)}
+
+
+def apply_publish_result(post, publish_result):
+    """
+    Record the outcome of the publish step on a Post without committing
+    The creation_id and image_url are kept so a retry only repeats this step
+    """
+    if publish_result['success']:
+        post.instagram_id = publish_result['instagram_id']
+        post.status = 'published'
+        post.published_time = datetime.utcnow()
+    elif not publish_result.get('rate_limited'):
         post.status = 'failed'
-        db.session.commit()
-        return container_result
+
+
+def publish_to_instagram(post, account=None):
+    """
+    Main function to publish a post to Instagram
+    Takes a Post object, uploads its image and creates the media container,
+    then queues it as 'processing' for the container poller to publish once
+    Instagram has finished processing it. Stages that already completed on
+    an earlier attempt (upload, container creation) are not repeated.
+    Publishes with the given account, the post's account, or the first active one
+    """
+    from app.utils.credentials import credential_manager
     
-    # Store the creation_id
-    post.creation_id = container_result['creation_id']
-    post.status = 'pending'
-    db.session.commit()
+    # Cached credentials; tokens close to expiry are renewed in the background
+    credentials = credential_manager.get(account.id if account is not None else post.account_id)
     
-    # Publish the media
-    publish_result = publish_media(
-        creation_id=container_result['creation_id'],
-        access_token=account.access_token,
-        instagram_user_id=account.instagram_user_id
-    )
+    if not credentials:
+        return {'success': False, 'error': 'No active Instagram account found'}
     
-    if not publish_result['success']:
-        post.status = 'failed'
-        db.session.commit()
-        return publish_result
+    if credentials.is_expired():
+        return {'success': False, 'error': 'Failed to refresh access token'}
     
-    # Update the post with Instagram ID
-    post.instagram_id = publish_result['instagram_id']
-    post.status = 'published'
-    post.published_time = datetime.utcnow()
+    post.account_id = credentials.account_id
+    
+    # Label the upload and container stage timings with the account
+    with metrics_account(credentials.account_id):
+        # Get public URL for the image, reusing an earlier upload
+        if not post.image_url:
+            post.image_url = get_public_url_for_image(post)
+        
+        # Create media container, reusing one from an earlier attempt
+        if not post.creation_id:
+            container_result = create_media_container(
+                image_url=post.image_url,
+                caption=post.caption,
+                access_token=credentials.access_token,
+                instagram_user_id=credentials.instagram_user_id
+            )
+            
+            if not container_result['success']:
+                # Leave rate-limited posts queued for the next run instead of failing them
+                if not container_result.get('rate_limited'):
+                    post.status = 'failed'
+                db.session.commit()
+                return container_result
+            
+            # Store the creation_id
+            post.creation_id = container_result['creation_id']
+    
+    # Queue the container for publishing once Instagram has processed it
+    post.status = 'processing'
     db.session.commit()
     
     return {
-        'success': True, 
-        'instagram_id': publish_result['instagram_id'],
-        'message': 'Post successfully published to Instagram'
-    }
\ No newline at end of file
+        'success': True,
+        'status': 'processing',
+        'creation_id': post.creation_id,
+        'message': 'Media container created, publishing once Instagram finishes processing'
+    }
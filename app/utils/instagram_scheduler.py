@@ -1,98 +1,125 @@
 import os
+import time
+import uuid
 import logging
+from collections import Counter
 from datetime import datetime, timedelta
 from flask import current_app
-from app.models.models import Post, ContentTemplate
-from app.utils.content_generator import generate_caption
+from app.models.models import Post, ContentTemplate, InstagramAccount
+from app.utils.content_generator import generate_post_contents
 from app.utils.instagram_publisher import publish_to_instagram
+from app.utils.container_poller import poll_processing_containers
+from app.utils.job_queue import enqueue_periodic, job_handler, purge_finished_jobs
+from app.utils.posting_calendar import next_posting_times
+from app.utils.post_stats import increment_counters, status_deltas
+from app.utils.credentials import refresh_expiring_tokens
+from app.utils.image_ingest import prune_image_cache
+from app.utils.metrics import metrics_account, observe_stage, time_stage
 from app import db
-import random
-from PIL import Image, ImageDraw, ImageFont
 
 logger = logging.getLogger(__name__)
 
 def schedule_instagram_posts(scheduler):
     """
     Set up the scheduler for automated Instagram posting
+    Each periodic stage is enqueued on the persistent job queue at most once
+    per interval, however many scheduler processes are running, and job
+    workers pick it up from there.
+    Must be called inside an application context; jobs get their own
     """
-    # Define how often posts should be created
-    post_frequency_hours = int(current_app.config.get('POST_FREQUENCY', 24))
+    app = current_app._get_current_object()
+    config = current_app.config
     
-    # Schedule the job to run at the specified interval
-    scheduler.add_job(
-        create_and_publish_post,
-        'interval',
-        hours=post_frequency_hours,
-        id='instagram_post_job',
-        replace_existing=True,
-        next_run_time=datetime.now() + timedelta(minutes=1)  # First run after 1 minute
-    )
+    # Define how often posts should be published
+    post_frequency_hours = int(config.get('POST_FREQUENCY', 24))
     
-    logger.info(f"Instagram posting scheduled every {post_frequency_hours} hours")
+    periodic_jobs = [
+        # Keep a buffer of ready-to-publish drafts, generated ahead of time
+        ('fill_post_buffer', int(config.get('PRODUCER_INTERVAL_MINUTES', 30)) * 60, 0),
+        # Publish drafts as they come due, without any generation on this path
+        ('publish_due_posts', int(config.get('PUBLISH_CHECK_SECONDS', 60)), 10),
+        # Publish media containers as soon as Instagram has processed them
+        ('poll_containers', int(config.get('CONTAINER_POLL_SECONDS', 15)), 10),
+        # Renew access tokens well before they expire, off the publish path
+        ('refresh_tokens', int(config.get('TOKEN_REFRESH_CHECK_MINUTES', 60)) * 60, 5),
+        ('purge_jobs', 3600, 0),
+        ('prune_image_cache', 3600, 0)
+    ]
+    
+    for kind, interval_seconds, priority in periodic_jobs:
+        scheduler.add_job(
+            run_in_app_context,
+            'interval',
+            args=[app, enqueue_periodic, kind, interval_seconds, priority],
+            seconds=interval_seconds,
+            id=f'{kind}_job',
+            replace_existing=True,
+            coalesce=True,
+            next_run_time=datetime.now() + timedelta(minutes=1)  # First run after 1 minute
+        )
+    
+    logger.info(f"Instagram posting scheduled every {post_frequency_hours} hours from a pre-generated buffer")
+
+
+def run_in_app_context(app, job, *args):
+    """Run a scheduled job inside the application context"""
+    with app.app_context():
+        return job(*args)
 
 
-def create_image_with_text(text, image_path=None):
+def create_image_with_text(text, image_path=None, background_style=None, seed=None, output_folder=None,
+                           image_cache_folder=None):
     """
     Create an image with the given text overlay
     If no image_path is provided, creates a new image with a gradient background
+    background_style and seed select and reproduce the generated gradient
+    A source image is cropped to the square format, reusing the normalized
+    copy in image_cache_folder (IMAGE_CACHE_DIR by default, '' disables it)
+    Pass background_style, output_folder and image_cache_folder explicitly
+    when running outside an app context, e.g. in a render pool worker process
     """
+    # Imaging libraries load on first render, not when the scheduler is imported
+    from PIL import ImageDraw
+    from app.utils.backgrounds import create_gradient_background
+    from app.utils.text_layout import DEFAULT_FONT_PATH, get_font, layout_text
+    from app.utils.image_ingest import load_source_image
+    
     try:
+        render_started = time.perf_counter()
         width, height = 1080, 1080  # Instagram square format
         
         if image_path and os.path.exists(image_path):
-            # Use the existing image
-            img = Image.open(image_path)
-            # Resize to square format if needed
-            img = img.resize((width, height))
+            # Downscaled decode and centre crop of the existing image, decoded once per source
+            img = load_source_image(
+                image_path,
+                (width, height),
+                current_app.config.get('IMAGE_CACHE_DIR') if image_cache_folder is None else image_cache_folder
+            )
         else:
             # Create a new image with gradient background
-            img = Image.new('RGB', (width, height), color=(random.randint(0, 255), 
-                                                          random.randint(0, 255), 
-                                                          random.randint(0, 255)))
-            
-            # Add a simple gradient effect
-            draw = ImageDraw.Draw(img)
-            for i in range(height):
-                # Create a gradient from top to bottom
-                r = int((i / height) * 255)
-                g = int(((height - i) / height) * 255)
-                b = random.randint(0, 255)
-                draw.line([(0, i), (width, i)], fill=(r, g, b, 128))
+            img = create_gradient_background(
+                width,
+                height,
+                style=background_style or current_app.config.get('GRADIENT_STYLE', 'linear'),
+                seed=seed
+            )
         
         # Add text overlay
         draw = ImageDraw.Draw(img)
         
-        # Try to use a nice font, fall back to default if not available
-        try:
-            font_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), 
-                                    'static', 'fonts', 'roboto-bold.ttf')
-            if os.path.exists(font_path):
-                font = ImageFont.truetype(font_path, size=40)
-            else:
-                font = ImageFont.load_default()
-        except Exception:
-            font = ImageFont.load_default()
-        
-        # Wrap text to fit the image
-        wrapped_text = []
-        words = text.split()
-        line = ""
-        for word in words:
-            test_line = line + word + " "
-            # Approximate text width - adjust based on your font
-            if len(test_line) * 20 < width - 100:  # Leave margins
-                line = test_line
-            else:
-                wrapped_text.append(line)
-                line = word + " "
-        wrapped_text.append(line)
+        # Wrap text to fit the image, leaving margins and shrinking long captions
+        layout = layout_text(
+            text,
+            DEFAULT_FONT_PATH,
+            font_size=40,
+            box_width=width - 100,
+            box_height=height - 100
+        )
+        font = get_font(DEFAULT_FONT_PATH, layout.font_size)
         
         # Draw the wrapped text
-        y_position = height / 2 - (len(wrapped_text) * 50 / 2)  # Center text vertically
-        for line in wrapped_text:
-            # Get the actual width of the line for this font
-            text_width = draw.textlength(line, font=font) if hasattr(draw, 'textlength') else len(line) * 20
-            
+        y_position = height / 2 - (len(layout.lines) * layout.line_height / 2)  # Center text vertically
+        for line, text_width in layout.lines:
             # Center the text horizontally
             x_position = (width - text_width) / 2
             
@@ -100,18 +127,21 @@ def create_image_with_text(text, image_path=None):
             draw.text((x_position+2, y_position+2), line, font=font, fill=(0, 0, 0, 200))  # Shadow
             draw.text((x_position, y_position), line, font=font, fill=(255, 255, 255, 255))  # Text
             
-            y_position += 50  # Move down for the next line
+            y_position += layout.line_height  # Move down for the next line
+        
+        observe_stage('render', time.perf_counter() - render_started, 'pillow')
         
         # Save the image
         timestamp = datetime.now().strftime("%Y%m%d%H%M%S")
-        output_filename = f"generated_post_{timestamp}.jpg"
-        output_path = os.path.join(current_app.config['UPLOAD_FOLDER'], output_filename)
+        output_filename = f"generated_post_{timestamp}_{uuid.uuid4().hex[:8]}.jpg"
+        output_path = os.path.join(output_folder or current_app.config['UPLOAD_FOLDER'], output_filename)
         
         # Ensure the directory exists
         os.makedirs(os.path.dirname(output_path), exist_ok=True)
         
         # Save the image
-        img.save(output_path, format='JPEG', quality=95)
+        with time_stage('jpeg_encode', 'pillow'):
+            img.save(output_path, format='JPEG', quality=95)
         
         return output_path
     
@@ -120,24 +150,216 @@ def create_image_with_text(text, image_path=None):
         return None
 
 
+def get_overlay_text(caption):
+    """Return the part of a caption to draw on the image, without hashtags"""
+    return caption.split("#")[0] if "#" in caption else caption
+
+
+def pre_generate_posts(count, start_time=None, interval_hours=None, scheduled_times=None, account_id=None):
+    """
+    Generate and render several draft posts at once
+    Content is generated in a single batch and images are rendered in
+    parallel on the render pool. Posts get the given scheduled_times, or are
+    scheduled interval_hours apart (POST_FREQUENCY by default) starting at
+    start_time, and are assigned to account_id if given.
+    Returns the created Post objects
+    """
+    from app import render_service
+    
+    if scheduled_times is None:
+        start_time = start_time or datetime.now()
+        interval = timedelta(hours=interval_hours or int(current_app.config.get('POST_FREQUENCY', 24)))
+        scheduled_times = [start_time + index * interval for index in range(count)]
+    
+    # Stage timings for generating and rendering these posts are labelled with the account
+    with metrics_account(account_id):
+        contents = generate_post_contents(count)
+        futures = render_service.render_batch(
+            [{'text': get_overlay_text(content['caption'])} for content in contents]
+        )
+    
+    posts = []
+    for content, future, scheduled_time in zip(contents, futures, scheduled_times):
+        image_path = future.result()
+        if not image_path:
+            logger.error("Failed to render image for a pre-generated post")
+            continue
+        
+        posts.append(Post(
+            caption=f"{content['caption']}\n\n{content['hashtags']}",
+            image_path=image_path,
+            status='draft',
+            account_id=account_id,
+            scheduled_time=scheduled_time
+        ))
+    
+    db.session.add_all(posts)
+    db.session.commit()
+    
+    logger.info(f"Pre-generated {len(posts)} of {count} posts")
+    return posts
+
+
+def fill_post_buffer(buffer_size=None):
+    """
+    Producer stage: top up the buffer of ready draft posts
+    Accounts with a posting calendar keep their own buffer, scheduled into
+    their next jittered slots outside blackout windows. Posts without an
+    account share one buffer scheduled POST_FREQUENCY apart. Drafts are
+    generated and rendered ahead of their scheduled_time, so publishing
+    never waits on model inference or rendering.
+    Returns the number of posts created
+    """
+    try:
+        config = current_app.config
+        buffer_size = buffer_size or int(config.get('POST_BUFFER_SIZE', 7))
+        now = datetime.now()
+        
+        # Ready drafts and latest scheduled time per account in two grouped queries
+        ready_counts = dict(db.session.query(Post.account_id, db.func.count(Post.id)).filter(
+            Post.status == 'draft',
+            Post.scheduled_time.isnot(None)
+        ).group_by(Post.account_id).all())
+        last_scheduled = dict(db.session.query(Post.account_id, db.func.max(Post.scheduled_time)).filter(
+            Post.status.in_(['draft', 'pending', 'processing', 'published'])
+        ).group_by(Post.account_id).all())
+        
+        accounts = InstagramAccount.query.filter_by(active=True).all()
+        calendar_accounts = [account for account in accounts if account.get_posting_slots()]
+        created = 0
+        
+        for account in calendar_accounts:
+            missing = buffer_size - ready_counts.get(account.id, 0)
+            if missing <= 0:
+                continue
+            
+            after = max(last_scheduled.get(account.id) or now, now)
+            scheduled_times = next_posting_times(
+                account, after, missing, jitter_minutes=config.get('SLOT_JITTER_MINUTES', 10)
+            )
+            if scheduled_times:
+                created += len(pre_generate_posts(len(scheduled_times), scheduled_times=scheduled_times, account_id=account.id))
+        
+        # Accounts without a calendar publish from the shared POST_FREQUENCY buffer
+        if len(calendar_accounts) < len(accounts) or not accounts:
+            missing = buffer_size - ready_counts.get(None, 0)
+            if missing > 0:
+                # Continue the schedule after the latest post that is queued or published
+                interval = timedelta(hours=int(config.get('POST_FREQUENCY', 24)))
+                last = last_scheduled.get(None)
+                start_time = max(last + interval, now) if last else now
+                created += len(pre_generate_posts(missing, start_time=start_time))
+        
+        return created
+    
+    except Exception as e:
+        db.session.rollback()
+        logger.error(f"Error filling post buffer: {str(e)}")
+        return 0
+
+
+def release_stale_claims(max_age_seconds=None):
+    """
+    Put posts claimed for publishing back in the buffer if their claim outlived the job lease
+    A worker that died between claiming a draft and publishing it would
+    otherwise leave the post 'pending' for good
+    Returns the number of posts released
+    """
+    max_age_seconds = max_age_seconds or int(current_app.config.get('JOB_LEASE_SECONDS', 60))
+    cutoff = datetime.utcnow() - timedelta(seconds=max_age_seconds)
+    
+    released = Post.query.filter(
+        Post.status == 'pending',
+        Post.updated_at < cutoff
+    ).update({'status': 'draft'}, synchronize_session=False)
+    if released:
+        # Bulk updates skip the flush listener, so count the transitions directly
+        deltas = status_deltas('pending', 'draft')
+        increment_counters(Counter({key: value * released for key, value in deltas.items()}))
+        logger.warning(f"Released {released} posts left pending by a failed publish run")
+    db.session.commit()
+    return released
+
+
+def publish_due_posts(limit=None):
+    """
+    Publish stage: hand the ready drafts whose scheduled_time has passed to the publisher
+    Due drafts are read from the database (an index range scan on
+    ix_post_status_scheduled_time), so posts created by the API, imports or
+    other processes publish on time
+    Posts that fail to publish are marked failed; rate-limited ones go back
+    to the buffer
+    Returns the number of posts queued for publishing
+    """
+    config = current_app.config
+    limit = limit or int(config.get('PUBLISH_JOB_BATCH_SIZE', 5))
+    
+    release_stale_claims()
+    now = datetime.now()
+    
+    due_ids = [row.id for row in db.session.query(Post.id).filter(
+        Post.status == 'draft',
+        Post.scheduled_time <= now
+    ).order_by(Post.scheduled_time).limit(limit)]
+    
+    queued = 0
+    for post_id in due_ids:
+        # Move the draft to pending first so overlapping runs never publish it twice
+        # updated_at records when the claim was made, for release_stale_claims
+        claimed = Post.query.filter_by(id=post_id, status='draft').update(
+            {'status': 'pending', 'updated_at': datetime.utcnow()}, synchronize_session=False
+        )
+        if claimed:
+            # Bulk updates skip the flush listener, so count the claim directly
+            increment_counters(status_deltas('draft', 'pending'))
+        db.session.commit()
+        if not claimed:
+            continue
+        
+        post = db.session.get(Post, post_id)
+        try:
+            result = publish_to_instagram(post)
+            if result.get('rate_limited'):
+                # Put it back in the buffer for the next run
+                post.status = 'draft'
+                db.session.commit()
+            elif result.get('success'):
+                logger.info(f"Queued post {post.id} for publishing to Instagram")
+                queued += 1
+            else:
+                logger.error(f"Failed to publish post {post.id}: {result.get('error')}")
+                # Missing account or a dead token: do not leave the claim pending
+                if post.status == 'pending':
+                    post.status = 'failed'
+                    db.session.commit()
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Error publishing post {post.id}: {str(e)}")
+            post.status = 'failed'
+            db.session.commit()
+    
+    return queued
+
+
 def create_and_publish_post():
     """
     Create a new post with AI-generated content and publish it to Instagram
+    Runs every stage inline; the scheduler uses fill_post_buffer and
+    publish_due_posts instead so publishing is not delayed by generation
     """
     try:
         logger.info("Starting automated post creation process")
         
-        # Generate a caption with AI
-        caption = generate_caption('caption')
-        
-        # Generate hashtags
-        hashtags = generate_caption('hashtags')
+        # Generate a caption and hashtags with AI in a single batch
+        contents = generate_post_contents(1)[0]
+        caption = contents['caption']
+        hashtags = contents['hashtags']
         
         # Combine caption and hashtags
         full_caption = f"{caption}\n\n{hashtags}"
         
         # Create an image with text overlay
-        image_path = create_image_with_text(caption.split("#")[0] if "#" in caption else caption)
+        image_path = create_image_with_text(get_overlay_text(caption))
         
         if not image_path:
             logger.error("Failed to create image for the post")
@@ -160,7 +382,7 @@ def create_and_publish_post():
         result = publish_to_instagram(post)
         
         if result.get('success'):
-            logger.info(f"Successfully published post {post.id} to Instagram")
+            logger.info(f"Queued post {post.id} for publishing to Instagram")
             return True
         else:
             logger.error(f"Failed to publish post {post.id}: {result.get('error')}")
@@ -168,4 +390,25 @@ def create_and_publish_post():
     
     except Exception as e:
         logger.error(f"Error in automated post creation: {str(e)}")
-        return False
\ No newline at end of file
+        return False
+
+
+@job_handler('publish_post')
+def publish_post_job(post_id):
+    """Publish a single post from the job queue"""
+    post = db.session.get(Post, post_id)
+    if post is None:
+        raise ValueError(f"Post {post_id} not found")
+    
+    result = publish_to_instagram(post)
+    if not result.get('success') and not result.get('rate_limited'):
+        raise RuntimeError(result.get('error', 'Unknown error'))
+
+
+# Pipeline stages the persistent job queue can run
+job_handler('fill_post_buffer')(fill_post_buffer)
+job_handler('publish_due_posts')(publish_due_posts)
+job_handler('poll_containers')(poll_processing_containers)
+job_handler('refresh_tokens')(refresh_expiring_tokens)
+job_handler('purge_jobs')(purge_finished_jobs)
+job_handler('prune_image_cache')(prune_image_cache)
@@ -0,0 +1,233 @@
+import os
+import json
+import time
+import uuid
+import socket
+import logging
+import threading
+from datetime import datetime, timedelta
+from sqlalchemy import and_, or_
+from sqlalchemy.exc import IntegrityError
+from flask import current_app
+from app.models.models import Job
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Job kind -> callable taking the payload as keyword arguments
+JOB_HANDLERS = {}
+
+
+def job_handler(kind):
+    """Register a function as the handler for a job kind"""
+    def register(func):
+        JOB_HANDLERS[kind] = func
+        return func
+    return register
+
+
+def enqueue_job(kind, payload=None, run_at=None, priority=0, max_attempts=3, dedupe_key=None):
+    """
+    Add a job to the persistent queue
+    A job whose dedupe_key is already queued or recorded is skipped, which
+    lets several schedulers enqueue the same periodic tick safely
+    Returns the Job, or None if it was a duplicate
+    """
+    job = Job(
+        kind=kind,
+        payload=json.dumps(payload or {}),
+        run_at=run_at or datetime.utcnow(),
+        priority=priority,
+        max_attempts=max_attempts,
+        dedupe_key=dedupe_key
+    )
+
+    try:
+        db.session.add(job)
+        db.session.commit()
+        return job
+    except IntegrityError:
+        db.session.rollback()
+        return None
+
+
+def enqueue_periodic(kind, interval_seconds, priority=0):
+    """Enqueue at most one job of this kind per interval across all schedulers"""
+    slot = int(time.time() // interval_seconds)
+    return enqueue_job(kind, priority=priority, max_attempts=1, dedupe_key=f"{kind}:{slot}")
+
+
+def _claimable(now):
+    """Queued jobs that are due, or running jobs whose worker stopped heartbeating"""
+    return or_(
+        and_(Job.status == 'queued', Job.run_at <= now),
+        and_(Job.status == 'running', Job.lease_expires_at < now)
+    )
+
+
+def claim_job(worker_id, kinds=None, lease_seconds=60):
+    """
+    Claim the next due job for this worker
+    Claiming is a conditional UPDATE on the row, so when several workers race
+    for the same job exactly one of them wins. Jobs whose lease expired are
+    reclaimed and count as a new attempt.
+    Returns the claimed Job or None
+    """
+    now = datetime.utcnow()
+
+    query = db.session.query(Job.id).filter(_claimable(now))
+    if kinds:
+        query = query.filter(Job.kind.in_(kinds))
+    candidates = [job_id for (job_id,) in query.order_by(Job.priority.desc(), Job.run_at).limit(10)]
+
+    for job_id in candidates:
+        claimed = Job.query.filter(Job.id == job_id, _claimable(now)).update({
+            'status': 'running',
+            'locked_by': worker_id,
+            'lease_expires_at': now + timedelta(seconds=lease_seconds),
+            'heartbeat_at': now,
+            'attempts': Job.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+
+        if not claimed:
+            continue
+
+        job = db.session.get(Job, job_id)
+        if job.attempts > job.max_attempts:
+            # Reclaimed after a crash with no attempts left
+            job.status = 'failed'
+            job.last_error = job.last_error or 'Lease expired'
+            db.session.commit()
+            continue
+
+        return job
+
+    return None
+
+
+def heartbeat_job(job_id, worker_id, lease_seconds=60):
+    """Extend a running job's lease, returning False if this worker lost it"""
+    now = datetime.utcnow()
+    renewed = Job.query.filter(
+        Job.id == job_id,
+        Job.locked_by == worker_id,
+        Job.status == 'running'
+    ).update({
+        'lease_expires_at': now + timedelta(seconds=lease_seconds),
+        'heartbeat_at': now
+    }, synchronize_session=False)
+    db.session.commit()
+    return bool(renewed)
+
+
+def complete_job(job_id, worker_id):
+    """Mark a job done if this worker still holds it"""
+    Job.query.filter(Job.id == job_id, Job.locked_by == worker_id).update({
+        'status': 'done',
+        'lease_expires_at': None
+    }, synchronize_session=False)
+    db.session.commit()
+
+
+def fail_job(job_id, worker_id, error, retry_delay=30):
+    """Requeue a failed job with exponential backoff, or mark it failed when out of attempts"""
+    job = db.session.get(Job, job_id)
+    if job is None or job.locked_by != worker_id:
+        return
+
+    job.last_error = error
+    job.lease_expires_at = None
+    if job.attempts < job.max_attempts:
+        job.status = 'queued'
+        job.run_at = datetime.utcnow() + timedelta(seconds=retry_delay * (2 ** (job.attempts - 1)))
+    else:
+        job.status = 'failed'
+    db.session.commit()
+
+
+def purge_finished_jobs(older_than_hours=24):
+    """Delete done and failed jobs older than the given age"""
+    cutoff = datetime.utcnow() - timedelta(hours=older_than_hours)
+    deleted = Job.query.filter(
+        Job.status.in_(['done', 'failed']),
+        Job.updated_at < cutoff
+    ).delete(synchronize_session=False)
+    db.session.commit()
+    return deleted
+
+
+class JobWorker:
+    """
+    Pulls jobs from the persistent queue and runs their handlers
+    While a handler runs, a heartbeat thread keeps extending the job's lease
+    so other workers only take it over if this process dies
+    """
+
+    def __init__(self, app, worker_id=None, kinds=None, poll_interval=None, lease_seconds=None):
+        self.app = app
+        # Unique per worker; several workers are built on the same thread of one process
+        self.worker_id = worker_id or f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self.kinds = kinds
+        self.poll_interval = poll_interval or app.config.get('JOB_POLL_SECONDS', 2)
+        self.lease_seconds = lease_seconds or app.config.get('JOB_LEASE_SECONDS', 60)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def run(self):
+        """Process jobs until stop() is called"""
+        logger.info(f"Job worker {self.worker_id} started")
+        while not self._stop.is_set():
+            try:
+                with self.app.app_context():
+                    job = claim_job(self.worker_id, self.kinds, self.lease_seconds)
+                    if job:
+                        self._execute(job)
+                        continue
+            except Exception as e:
+                logger.error(f"Job worker {self.worker_id} error: {str(e)}")
+            self._stop.wait(self.poll_interval)
+        logger.info(f"Job worker {self.worker_id} stopped")
+
+    def start(self):
+        """Run the worker loop on a daemon thread"""
+        self._thread = threading.Thread(target=self.run, name=f"job-worker-{self.worker_id}", daemon=True)
+        self._thread.start()
+        return self._thread
+
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread:
+            self._thread.join(timeout)
+
+    def _execute(self, job):
+        job_id, kind = job.id, job.kind
+        handler = JOB_HANDLERS.get(kind)
+        if handler is None:
+            fail_job(job_id, self.worker_id, f"No handler for job kind {kind}")
+            return
+
+        done = threading.Event()
+        beat = threading.Thread(target=self._heartbeat, args=(job_id, done), daemon=True)
+        beat.start()
+
+        try:
+            handler(**json.loads(job.payload or '{}'))
+            complete_job(job_id, self.worker_id)
+        except Exception as e:
+            db.session.rollback()
+            logger.error(f"Job {job_id} ({kind}) failed: {str(e)}")
+            fail_job(job_id, self.worker_id, str(e), current_app.config.get('JOB_RETRY_SECONDS', 30))
+        finally:
+            done.set()
+            beat.join()
+
+    def _heartbeat(self, job_id, done):
+        while not done.wait(self.lease_seconds / 3):
+            try:
+                with self.app.app_context():
+                    if not heartbeat_job(job_id, self.worker_id, self.lease_seconds):
+                        logger.warning(f"Job worker {self.worker_id} lost the lease on job {job_id}")
+                        return
+            except Exception as e:
+                logger.error(f"Heartbeat for job {job_id} failed: {str(e)}")
@@ -0,0 +1,144 @@
+import time
+import bisect
+import threading
+import contextvars
+from contextlib import contextmanager
+
+# Upper bounds in seconds, from a cached lookup to a slow Graph API call
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+class Histogram:
+    """
+    Thread-safe histogram with fixed labels, rendered in Prometheus text format
+    Values are counted in cumulative buckets plus a running sum and count
+    per label combination, like prometheus_client's Histogram
+    """
+
+    def __init__(self, name, documentation, labelnames, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels):
+        """Record one value for a tuple of label values in labelnames order"""
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # One counter per bucket plus +Inf, then the sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def render(self):
+        with self._lock:
+            snapshot = {labels: list(series) for labels, series in self._series.items()}
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for labels, series in sorted(snapshot.items()):
+            label_text = ','.join(f'{name}="{_escape(value)}"' for name, value in zip(self.labelnames, labels))
+            label_block = f"{{{label_text}}}" if label_text else ''
+            separator = ',' if label_text else ''
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float('inf'),), series):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else repr(float(bound))
+                lines.append(f'{self.name}_bucket{{{label_text}{separator}le="{le}"}} {cumulative}')
+            lines.append(f"{self.name}_sum{label_block} {series[-1]!r}")
+            lines.append(f"{self.name}_count{label_block} {cumulative}")
+        return '\n'.join(lines)
+
+    def clear(self):
+        with self._lock:
+            self._series.clear()
+
+
+class MetricsRegistry:
+    """The metrics served on /metrics for this process"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self._metrics) + '\n'
+
+    def clear(self):
+        for metric in self._metrics:
+            metric.clear()
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+registry = MetricsRegistry()
+
+STAGE_SECONDS = registry.register(Histogram(
+    'instagram_stage_duration_seconds',
+    'Wall-clock time spent in each stage of the post pipeline',
+    ('stage', 'account', 'backend')
+))
+
+# Account the current thread or task is working for, used when a stage does not name one
+_account = contextvars.ContextVar('metrics_account', default=None)
+
+# Stage timings collected on this thread by capture_stages()
+_capture = threading.local()
+
+
+@contextmanager
+def metrics_account(account_id):
+    """Label stage timings recorded inside the block with account_id"""
+    token = _account.set(account_id)
+    try:
+        yield
+    finally:
+        _account.reset(token)
+
+
+def current_metrics_account():
+    return _account.get()
+
+
+def observe_stage(stage, seconds, backend='', account=None):
+    """Record one stage timing, labelled with the current account unless one is given"""
+    if account is None:
+        account = _account.get()
+    STAGE_SECONDS.observe(seconds, (stage, '' if account is None else str(account), backend or ''))
+
+    captured = getattr(_capture, 'timings', None)
+    if captured is not None:
+        captured.append((stage, seconds, backend))
+
+
+@contextmanager
+def time_stage(stage, backend='', account=None):
+    """Time the block as one pipeline stage; failures are timed too"""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.perf_counter() - started, backend, account)
+
+
+@contextmanager
+def capture_stages():
+    """
+    Collect the (stage, seconds, backend) timings recorded on this thread
+    Lets a worker process send its timings back to the process that
+    serves /metrics
+    """
+    previous = getattr(_capture, 'timings', None)
+    _capture.timings = []
+    try:
+        yield _capture.timings
+    finally:
+        _capture.timings = previous
@@ -0,0 +1,52 @@
+import logging
+from sqlalchemy import inspect, text
+from app.models.models import PostStat
+from app import db
+
+logger = logging.getLogger(__name__)
+
+
+def upgrade_schema():
+    """
+    Bring an existing database up to date with the models
+    db.create_all only creates missing tables, so this also adds columns
+    and indexes that were introduced after a table was first created.
+    Safe to run repeatedly; must be called inside an app context.
+    Returns a list of the changes applied
+    """
+    existing_tables = set(inspect(db.engine).get_table_names())
+    db.create_all()
+
+    engine = db.engine
+    preparer = engine.dialect.identifier_preparer
+    inspector = inspect(engine)
+    changes = []
+
+    with engine.begin() as conn:
+        for table in db.metadata.sorted_tables:
+            existing_columns = {column['name'] for column in inspector.get_columns(table.name)}
+            for column in table.columns:
+                if column.name in existing_columns:
+                    continue
+                column_type = column.type.compile(dialect=engine.dialect)
+                conn.execute(text(
+                    f"ALTER TABLE {preparer.quote(table.name)} ADD COLUMN {preparer.quote(column.name)} {column_type}"
+                ))
+                changes.append(f"added column {table.name}.{column.name}")
+
+            existing_indexes = {index['name'] for index in inspector.get_indexes(table.name)}
+            for index in table.indexes:
+                if index.name in existing_indexes:
+                    continue
+                index.create(conn)
+                changes.append(f"created index {index.name}")
+
+    if PostStat.__tablename__ not in existing_tables and 'post' in existing_tables:
+        # Counters start from the posts already stored
+        from app.utils.post_stats import rebuild_post_stats
+        rebuild_post_stats()
+        changes.append(f"backfilled {PostStat.__tablename__} counters")
+
+    for change in changes:
+        logger.info(f"Schema upgrade: {change}")
+    return changes
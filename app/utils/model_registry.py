@@ -0,0 +1,150 @@
+import logging
+import threading
+import time
+from collections import OrderedDict
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide registry of text-generation pipelines
+    Pipelines are keyed by (model name, device), loaded once per process and
+    kept resident up to max_models, evicting the least recently used one
+    """
+
+    def __init__(self, max_models=2):
+        self.max_models = max_models
+        self._models = OrderedDict()
+        self._stats = {}
+        self._lock = threading.Lock()
+        self._load_locks = {}
+
+    def configure(self, max_models=None):
+        """Update registry limits, evicting models that no longer fit"""
+        with self._lock:
+            if max_models is not None:
+                self.max_models = max(1, int(max_models))
+            self._evict_overflow()
+
+    def get(self, model_name, device=-1):
+        """
+        Return the pipeline for (model_name, device), loading it on first use
+        Concurrent callers asking for the same model share a single load
+        """
+        key = (model_name, device)
+        with self._lock:
+            if key in self._models:
+                self._models.move_to_end(key)
+                self._stats[key]['hits'] += 1
+                self._stats[key]['last_used'] = time.time()
+                return self._models[key]
+            load_lock = self._load_locks.setdefault(key, threading.Lock())
+
+        with load_lock:
+            # Another thread may have finished loading while we waited
+            with self._lock:
+                if key in self._models:
+                    self._models.move_to_end(key)
+                    self._stats[key]['hits'] += 1
+                    self._stats[key]['last_used'] = time.time()
+                    return self._models[key]
+
+            generator, load_seconds = self._load(model_name, device)
+
+            with self._lock:
+                self._models[key] = generator
+                self._stats[key] = {
+                    'model': model_name,
+                    'device': device,
+                    'load_seconds': load_seconds,
+                    'memory_bytes': _estimate_memory(generator),
+                    'loaded_at': time.time(),
+                    'last_used': time.time(),
+                    'hits': 0
+                }
+                self._load_locks.pop(key, None)
+                self._evict_overflow()
+
+            return generator
+
+    def warm_up(self, model_name, device=-1):
+        """Load a model ahead of the first generation request"""
+        try:
+            self.get(model_name, device)
+            logger.info(f"Warmed up text-generation model {model_name} on device {device}")
+            return True
+        except Exception as e:
+            logger.error(f"Error warming up model {model_name}: {str(e)}")
+            return False
+
+    def evict(self, model_name, device=-1):
+        """Drop a resident model, returning True if it was loaded"""
+        with self._lock:
+            key = (model_name, device)
+            self._stats.pop(key, None)
+            return self._models.pop(key, None) is not None
+
+    def clear(self):
+        """Drop every resident model"""
+        with self._lock:
+            self._models.clear()
+            self._stats.clear()
+
+    def stats(self):
+        """Return load time and memory use for each resident model, most recent last"""
+        with self._lock:
+            models = [dict(self._stats[key]) for key in self._models]
+        return {
+            'max_models': self.max_models,
+            'resident': len(models),
+            'memory_bytes': sum(m['memory_bytes'] or 0 for m in models),
+            'models': models
+        }
+
+    def _load(self, model_name, device):
+        from transformers import pipeline
+
+        started = time.perf_counter()
+        generator = pipeline('text-generation', model=model_name, device=device)
+        load_seconds = time.perf_counter() - started
+        logger.info(f"Loaded text-generation model {model_name} on device {device} in {load_seconds:.2f}s")
+        return generator, load_seconds
+
+    def _evict_overflow(self):
+        while len(self._models) > self.max_models:
+            (model_name, device), _ = self._models.popitem(last=False)
+            self._stats.pop((model_name, device), None)
+            logger.info(f"Evicted text-generation model {model_name} on device {device}")
+
+
+def _estimate_memory(generator):
+    """Approximate resident size of a pipeline from its parameters and buffers"""
+    try:
+        model = generator.model
+        tensors = list(model.parameters()) + list(model.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    except Exception:
+        return None
+
+
+# Shared registry for this worker process
+model_registry = ModelRegistry()
+
+
+def init_model_registry(app):
+    """
+    Configure the registry from app config and optionally warm up the
+    configured model in a background thread so startup is not blocked
+    """
+    model_registry.configure(max_models=app.config.get('MODEL_REGISTRY_MAX_MODELS', 2))
+
+    if app.config.get('MODEL_WARMUP'):
+        model_name = app.config.get('CONTENT_GENERATION_MODEL', 'gpt-neo-125M')
+        device = app.config.get('CONTENT_GENERATION_DEVICE', -1)
+        threading.Thread(
+            target=model_registry.warm_up,
+            args=(model_name, device),
+            name='model-warmup',
+            daemon=True
+        ).start()
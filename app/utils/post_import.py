@@ -0,0 +1,187 @@
+import re
+import json
+import logging
+import warnings
+from collections import Counter
+from datetime import datetime
+from app.models.models import Post, InstagramAccount
+from app.utils.post_stats import increment_counters, insert_deltas
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Statuses an imported post may start in
+IMPORT_STATUSES = {'draft', 'published', 'failed'}
+
+# Date, or date and time with optional seconds, microseconds and UTC offset;
+# stricter than NumPy, which also takes '2024', 'now' and 'today'
+ISO_DATETIME = re.compile(
+    r'\d{4}-\d{2}-\d{2}'
+    r'(?:[T ]\d{2}:\d{2}(?::\d{2}(?:\.\d{1,6})?)?(?P<offset>Z|[+-]\d{2}:\d{2})?)?\Z'
+)
+
+
+def read_ndjson(lines):
+    """
+    Decode an NDJSON stream into rows, one JSON object per non-empty line
+    Lines that are not valid JSON objects become per-row errors instead of
+    failing the whole import
+    Returns (rows, errors) where rows hold None at the index of bad lines
+    and errors maps index -> message
+    """
+    rows, errors = [], {}
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+            if not isinstance(row, dict):
+                raise ValueError('Expected a JSON object')
+            rows.append(row)
+        except ValueError as e:
+            errors[len(rows)] = f"Invalid JSON: {str(e)}"
+            rows.append(None)
+    return rows, errors
+
+
+def parse_datetimes(values):
+    """
+    Parse a column of ISO datetime strings into naive server-local datetimes
+    Every value must match ISO_DATETIME, so whether a row is valid never
+    depends on the other rows. Naive values are parsed in one NumPy pass;
+    values with a UTC offset, and the whole column if NumPy rejects it (an
+    impossible date such as February 30th), are parsed one by one with
+    datetime.fromisoformat and offsets converted to local time.
+    Returns (datetimes, errors) where errors maps index -> message
+    """
+    import numpy as np
+    
+    parsed = [None] * len(values)
+    errors = {}
+    naive, aware = [], []
+    for i, value in enumerate(values):
+        if value in (None, ''):
+            continue
+        match = ISO_DATETIME.match(value) if isinstance(value, str) else None
+        if match is None:
+            errors[i] = f"Invalid scheduled_time {value!r}"
+        elif match.group('offset'):
+            aware.append(i)
+        else:
+            naive.append(i)
+
+    if naive:
+        try:
+            with warnings.catch_warnings():
+                warnings.simplefilter('error')
+                column = np.array([values[i] for i in naive], dtype='datetime64[us]')
+            if np.isnat(column).any():
+                raise ValueError('NaT in column')
+            for i, value in zip(naive, column.astype(object)):
+                parsed[i] = value
+            naive = []
+        except (ValueError, TypeError, Warning):
+            pass
+
+    for i in naive + aware:
+        try:
+            value = datetime.fromisoformat(values[i])
+            if value.tzinfo is not None:
+                value = value.astimezone().replace(tzinfo=None)
+            parsed[i] = value
+        except ValueError:
+            errors[i] = f"Invalid scheduled_time {values[i]!r}"
+
+    return parsed, errors
+
+
+def validate_rows(rows, errors=None):
+    """
+    Check every row and build the mappings to insert
+    errors holds rows already rejected, e.g. by read_ndjson
+    Returns (mappings, errors), mappings being (index, values) pairs
+    """
+    errors = dict(errors or {})
+    for i, row in enumerate(rows):
+        if i not in errors and not isinstance(row, dict):
+            errors[i] = 'Expected a JSON object'
+    rows = [None if i in errors else row for i, row in enumerate(rows)]
+
+    scheduled, time_errors = parse_datetimes([(row or {}).get('scheduled_time') for row in rows])
+    errors.update(time_errors)
+
+    account_ids = {row.get('account_id') for row in rows if row and isinstance(row.get('account_id'), int)}
+    known_accounts = {
+        account_id for (account_id,) in
+        db.session.query(InstagramAccount.id).filter(InstagramAccount.id.in_(account_ids))
+    } if account_ids else set()
+
+    mappings = []
+    for i, row in enumerate(rows):
+        if row is None or i in errors:
+            continue
+
+        caption = row.get('caption')
+        image_path = row.get('image_path')
+        status = row.get('status', 'draft')
+        account_id = row.get('account_id')
+
+        if not caption or not isinstance(caption, str):
+            errors[i] = 'caption is required'
+        elif len(caption) > Post.caption.type.length:
+            errors[i] = f"caption is longer than {Post.caption.type.length} characters"
+        elif not image_path or not isinstance(image_path, str):
+            errors[i] = 'image_path is required'
+        elif len(image_path) > Post.image_path.type.length:
+            errors[i] = f"image_path is longer than {Post.image_path.type.length} characters"
+        elif status not in IMPORT_STATUSES:
+            errors[i] = f"status must be one of {', '.join(sorted(IMPORT_STATUSES))}"
+        elif account_id is not None and (not isinstance(account_id, int) or account_id not in known_accounts):
+            errors[i] = f"Unknown account {account_id}"
+        else:
+            mappings.append((i, {
+                'caption': caption,
+                'image_path': image_path,
+                'image_url': row.get('image_url'),
+                'account_id': account_id,
+                'status': status,
+                'scheduled_time': scheduled[i]
+            }))
+
+    return mappings, errors
+
+
+def import_posts(rows, chunk_size=1000, errors=None):
+    """
+    Validate and insert many posts in a single transaction
+    Invalid rows are reported and skipped; valid ones are bulk inserted in
+    chunks of chunk_size and committed together, so either all valid rows
+    are stored or none are. Scheduled drafts go straight onto the due queue.
+    Returns {'created': [{'index', 'id'}], 'errors': [{'index', 'error'}]}
+    """
+    mappings, errors = validate_rows(rows, errors)
+    now = datetime.utcnow()
+    created = []
+
+    try:
+        for start in range(0, len(mappings), chunk_size):
+            chunk = mappings[start:start + chunk_size]
+            values = [dict(mapping, created_at=now, updated_at=now) for _, mapping in chunk]
+            db.session.bulk_insert_mappings(Post, values, return_defaults=True)
+            deltas = Counter()
+            for value in values:
+                deltas.update(insert_deltas(value['status'], now))
+            increment_counters(deltas)
+            created.extend({'index': i, 'id': value['id']} for (i, _), value in zip(chunk, values))
+        db.session.commit()
+    except Exception:
+        db.session.rollback()
+        raise
+
+    logger.info(f"Imported {len(created)} posts, rejected {len(errors)}")
+    return {
+        'created': created,
+        'errors': [{'index': i, 'error': error} for i, error in sorted(errors.items())]
+    }
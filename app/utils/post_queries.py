@@ -0,0 +1,142 @@
+import csv
+import io
+import json
+import base64
+from datetime import datetime
+from sqlalchemy import and_, or_
+from app.models.models import Post
+from app import db
+
+# Fields a client may select, in the order Post.to_dict returns them
+POST_FIELDS = [
+    'id', 'caption', 'image_path', 'image_url', 'instagram_id', 'account_id', 'status',
+    'scheduled_time', 'published_time', 'created_at', 'updated_at'
+]
+
+# Range filters and the column each one bounds
+RANGE_FILTERS = {
+    'created_after': (Post.created_at, '>='),
+    'created_before': (Post.created_at, '<'),
+    'scheduled_after': (Post.scheduled_time, '>='),
+    'scheduled_before': (Post.scheduled_time, '<'),
+}
+
+
+def parse_fields(value):
+    """Turn a comma-separated field list into validated field names, defaulting to all fields"""
+    if not value:
+        return list(POST_FIELDS)
+
+    fields = [field.strip() for field in value.split(',') if field.strip()]
+    unknown = [field for field in fields if field not in POST_FIELDS]
+    if unknown:
+        raise ValueError(f"Unknown fields: {', '.join(unknown)}")
+    return fields
+
+
+def encode_cursor(created_at, post_id):
+    """Opaque cursor pointing just after the given row"""
+    raw = json.dumps([created_at.isoformat(), post_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        created_at, post_id = json.loads(raw)
+        return datetime.fromisoformat(created_at), int(post_id)
+    except (ValueError, TypeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def filter_posts(query, args):
+    """
+    Apply the status, account and date range filters from request args
+    status accepts a comma-separated list; range bounds are ISO datetimes
+    """
+    if args.get('status'):
+        query = query.filter(Post.status.in_(args['status'].split(',')))
+
+    if args.get('account_id'):
+        query = query.filter(Post.account_id == int(args['account_id']))
+
+    for name, (column, op) in RANGE_FILTERS.items():
+        if args.get(name):
+            bound = datetime.fromisoformat(args[name])
+            query = query.filter(column >= bound if op == '>=' else column < bound)
+
+    return query
+
+
+def post_rows(fields, args):
+    """
+    Filtered query over only the selected columns, newest first
+    created_at and id are always loaded since the ordering and cursor use them
+    """
+    columns = [getattr(Post, field) for field in dict.fromkeys(fields + ['created_at', 'id'])]
+    query = filter_posts(db.session.query(*columns), args)
+    return query.order_by(Post.created_at.desc(), Post.id.desc())
+
+
+def serialize_row(row, fields):
+    """Row from post_rows as a dict shaped like Post.to_dict, limited to fields"""
+    data = {}
+    for field in fields:
+        value = getattr(row, field)
+        data[field] = value.isoformat() if isinstance(value, datetime) else value
+    return data
+
+
+def list_posts(args, default_limit=50, max_limit=200):
+    """
+    One page of posts using keyset pagination on (created_at, id)
+    Each page seeks past the previous page's last row through the
+    (created_at, id) index, so deep pages cost the same as the first one.
+    Returns (posts, next_cursor); next_cursor is None on the last page
+    """
+    fields = parse_fields(args.get('fields'))
+    limit = max(1, min(int(args.get('limit', default_limit)), max_limit))
+    query = post_rows(fields, args)
+
+    if args.get('cursor'):
+        created_at, post_id = decode_cursor(args['cursor'])
+        query = query.filter(or_(
+            Post.created_at < created_at,
+            and_(Post.created_at == created_at, Post.id < post_id)
+        ))
+
+    rows = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].created_at, rows[limit - 1].id) if len(rows) > limit else None
+    return [serialize_row(row, fields) for row in rows[:limit]], next_cursor
+
+
+def export_posts(args, export_format='ndjson', chunk_size=1000):
+    """
+    Generator over an export of the filtered posts as NDJSON lines or CSV text
+    Rows are fetched chunk_size at a time through yield_per, so memory stays
+    flat however many posts match. Arguments are validated before returning,
+    so bad requests fail before any output is streamed
+    """
+    fields = parse_fields(args.get('fields'))
+    if export_format not in ('ndjson', 'csv'):
+        raise ValueError(f"Unknown export format {export_format}")
+    rows = post_rows(fields, args).yield_per(chunk_size)
+
+    if export_format == 'ndjson':
+        return (json.dumps(serialize_row(row, fields)) + '\n' for row in rows)
+    return _csv_chunks(rows, fields, chunk_size)
+
+
+def _csv_chunks(rows, fields, chunk_size):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=fields)
+    writer.writeheader()
+
+    for count, row in enumerate(rows, 1):
+        writer.writerow(serialize_row(row, fields))
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+
+    yield buffer.getvalue()
@@ -0,0 +1,195 @@
+import json
+import hashlib
+import logging
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+from sqlalchemy import event, func, inspect
+from app.models.models import Post, PostStat
+from app import db
+
+logger = logging.getLogger(__name__)
+
+# Statuses that end a publish attempt, counted for the success rate
+OUTCOME_STATUSES = ('published', 'failed')
+
+
+def status_deltas(old_status, new_status, published_time=None):
+    """Counter changes for one post moving from old_status to new_status (None for insert/delete)"""
+    deltas = Counter()
+    if old_status == new_status:
+        return deltas
+
+    if old_status:
+        deltas[('status', old_status)] -= 1
+    if new_status:
+        deltas[('status', new_status)] += 1
+    if new_status in OUTCOME_STATUSES:
+        deltas[('outcome', new_status)] += 1
+    if new_status == 'published':
+        day = (published_time or datetime.utcnow()).date().isoformat()
+        deltas[('published_per_day', day)] += 1
+    return deltas
+
+
+def insert_deltas(status, created_at=None, published_time=None):
+    """Counter changes for a newly inserted post"""
+    deltas = status_deltas(None, status or 'draft', published_time)
+    deltas[('created_per_day', (created_at or datetime.utcnow()).date().isoformat())] += 1
+    return deltas
+
+
+def increment_counters(deltas, connection=None):
+    """
+    Apply counter deltas as atomic upserts in the current transaction
+    Counters therefore commit or roll back together with the status change
+    """
+    rows = [
+        {'metric': metric, 'bucket': bucket, 'value': value}
+        for (metric, bucket), value in deltas.items() if value
+    ]
+    if not rows:
+        return
+
+    connection = connection or db.session.connection()
+    table = PostStat.__table__
+    dialect = connection.dialect.name
+
+    if dialect in ('sqlite', 'postgresql'):
+        if dialect == 'sqlite':
+            from sqlalchemy.dialects.sqlite import insert
+        else:
+            from sqlalchemy.dialects.postgresql import insert
+        stmt = insert(table).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['metric', 'bucket'],
+            set_={'value': table.c.value + stmt.excluded.value}
+        )
+        connection.execute(stmt)
+        return
+
+    for row in rows:
+        updated = connection.execute(
+            table.update()
+            .where(table.c.metric == row['metric'], table.c.bucket == row['bucket'])
+            .values(value=table.c.value + row['value'])
+        )
+        if not updated.rowcount:
+            connection.execute(table.insert().values(**row))
+
+
+def _committed_status(post):
+    history = inspect(post).attrs.status.history
+    if history.deleted:
+        return history.deleted[0]
+    return history.unchanged[0] if history.unchanged else None
+
+
+def _count_status_changes(session, flush_context):
+    """Turn the Post inserts, status changes and deletes of a flush into counter deltas"""
+    deltas = Counter()
+
+    for obj in session.new:
+        if isinstance(obj, Post):
+            deltas.update(insert_deltas(obj.status, obj.created_at, obj.published_time))
+
+    for obj in session.dirty:
+        if isinstance(obj, Post):
+            history = inspect(obj).attrs.status.history
+            if history.added:
+                deltas.update(status_deltas(_committed_status(obj), history.added[0], obj.published_time))
+
+    for obj in session.deleted:
+        if isinstance(obj, Post):
+            deltas.update(status_deltas(_committed_status(obj), None))
+
+    increment_counters(deltas, session.connection())
+
+
+def init_post_stats():
+    """Keep the counters in step with every flush of the shared session"""
+    if not event.contains(db.session, 'after_flush', _count_status_changes):
+        event.listen(db.session, 'after_flush', _count_status_changes)
+
+
+def rebuild_post_stats():
+    """
+    Recompute every counter from the post table
+    Used to backfill an existing database; outcomes are approximated by
+    the current number of published and failed posts
+    """
+    PostStat.query.delete()
+
+    deltas = Counter()
+    for status, count in db.session.query(Post.status, func.count(Post.id)).group_by(Post.status):
+        deltas[('status', status or 'draft')] += count
+        if status in OUTCOME_STATUSES:
+            deltas[('outcome', status)] += count
+
+    created_day = func.date(Post.created_at)
+    for day, count in db.session.query(created_day, func.count(Post.id)).filter(Post.created_at.isnot(None)).group_by(created_day):
+        deltas[('created_per_day', str(day))] += count
+
+    published_day = func.date(Post.published_time)
+    for day, count in db.session.query(published_day, func.count(Post.id)).filter(
+        Post.status == 'published', Post.published_time.isnot(None)
+    ).group_by(published_day):
+        deltas[('published_per_day', str(day))] += count
+
+    increment_counters(deltas)
+    db.session.commit()
+
+
+def compute_stats(days=30):
+    """Dashboard statistics read from the counters, with daily volume for the last days"""
+    since = (datetime.utcnow().date() - timedelta(days=days - 1)).isoformat()
+    counters = {}
+    for stat in PostStat.query.filter(
+        PostStat.metric.in_(['status', 'outcome']) | (PostStat.bucket >= since)
+    ):
+        counters.setdefault(stat.metric, {})[stat.bucket] = stat.value
+
+    by_status = {status: count for status, count in counters.get('status', {}).items() if count}
+    outcomes = counters.get('outcome', {})
+    attempts = sum(outcomes.get(status, 0) for status in OUTCOME_STATUSES)
+
+    daily = []
+    for offset in range(days):
+        day = (datetime.utcnow().date() - timedelta(days=days - 1 - offset)).isoformat()
+        daily.append({
+            'date': day,
+            'created': counters.get('created_per_day', {}).get(day, 0),
+            'published': counters.get('published_per_day', {}).get(day, 0)
+        })
+
+    return {
+        'total_posts': sum(by_status.values()),
+        'posts_by_status': by_status,
+        'publish_attempts': attempts,
+        'publish_success_rate': round(outcomes.get('published', 0) / attempts, 4) if attempts else None,
+        'daily': daily
+    }
+
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+def get_cached_stats(days=30, ttl=15):
+    """
+    Serialized stats and their ETag, recomputed at most once per ttl seconds
+    Returns (body, etag)
+    """
+    now = time.monotonic()
+    with _cache_lock:
+        cached = _cache.get(days)
+        if cached and cached[0] > now:
+            return cached[1], cached[2]
+
+    body = json.dumps({'success': True, 'stats': compute_stats(days)}, sort_keys=True)
+    etag = hashlib.md5(body.encode()).hexdigest()
+
+    with _cache_lock:
+        _cache[days] = (now + ttl, body, etag)
+    return body, etag
@@ -0,0 +1,72 @@
+import hashlib
+import logging
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+logger = logging.getLogger(__name__)
+
+
+def parse_clock(value):
+    """Parse a local "HH:MM" time"""
+    hours, minutes = value.split(':')
+    return time(int(hours), int(minutes))
+
+
+def in_blackout(local_dt, blackout_windows):
+    """Check whether a local datetime falls in any "HH:MM-HH:MM" window (windows may wrap midnight)"""
+    clock = local_dt.time()
+    for window in blackout_windows:
+        start, end = (parse_clock(part) for part in window.split('-'))
+        if start <= end:
+            if start <= clock < end:
+                return True
+        elif clock >= start or clock < end:
+            return True
+    return False
+
+
+def slot_jitter(account_id, slot_key, jitter_seconds):
+    """
+    Stable offset in [-jitter_seconds, jitter_seconds] for one account's slot
+    Derived from a hash so every process computes the same time, while
+    different accounts sharing a slot are spread apart
+    """
+    if jitter_seconds <= 0:
+        return 0
+    digest = hashlib.md5(f"{account_id}:{slot_key}".encode()).digest()
+    return int.from_bytes(digest[:4], 'big') % (2 * jitter_seconds + 1) - jitter_seconds
+
+
+def next_posting_times(account, after, count, jitter_minutes=10, max_days=60):
+    """
+    Return the next count posting times for an account after the given time
+    Slots come from the account's calendar in its own time zone, get a
+    per-account jitter and skip blackout windows. Times are returned as
+    naive server-local datetimes, like Post.scheduled_time.
+    """
+    slots = sorted(parse_clock(slot) for slot in account.get_posting_slots())
+    if not slots:
+        return []
+
+    tz = ZoneInfo(account.timezone or 'UTC')
+    blackout_windows = account.get_blackout_windows()
+    jitter_seconds = int(jitter_minutes * 60)
+
+    after_local = after.astimezone(tz)
+    times = []
+    day = after_local.date()
+
+    for _ in range(max_days):
+        for slot in slots:
+            slot_local = datetime.combine(day, slot, tzinfo=tz)
+            slot_local += timedelta(seconds=slot_jitter(account.id, f"{day.isoformat()}T{slot}", jitter_seconds))
+
+            if slot_local <= after_local or in_blackout(slot_local, blackout_windows):
+                continue
+
+            times.append(slot_local.astimezone().replace(tzinfo=None))
+            if len(times) == count:
+                return times
+        day += timedelta(days=1)
+
+    return times
@@ -0,0 +1,86 @@
+import io
+import os
+import time
+import uuid
+import pstats
+import logging
+from datetime import datetime
+from flask import current_app, g, request
+
+logger = logging.getLogger(__name__)
+
+PROFILERS = ('cprofile', 'pyinstrument')
+
+
+def init_request_profiling(blueprint):
+    """
+    Add the optional per-request profiler to a blueprint
+    With REQUEST_PROFILER set to cprofile or pyinstrument, requests carrying
+    ?profile=1 or an X-Profile header (or every request, with
+    REQUEST_PROFILE_ALL) are profiled and the report is written to
+    REQUEST_PROFILE_DIR; its path is returned in the X-Profile-Path header.
+    Streamed response bodies are produced after the profile is taken
+    """
+    blueprint.before_request(start_request_profile)
+    blueprint.after_request(finish_request_profile)
+
+
+def start_request_profile():
+    config = current_app.config
+    profiler_name = (config.get('REQUEST_PROFILER') or '').lower()
+    if not profiler_name:
+        return
+    if not (config.get('REQUEST_PROFILE_ALL', False) or request.args.get('profile') or request.headers.get('X-Profile')):
+        return
+    if profiler_name not in PROFILERS:
+        logger.error(f"Unknown REQUEST_PROFILER {profiler_name}, expected one of {', '.join(PROFILERS)}")
+        return
+
+    try:
+        if profiler_name == 'cprofile':
+            import cProfile
+            profiler = cProfile.Profile()
+            profiler.enable()
+        else:
+            from pyinstrument import Profiler
+            profiler = Profiler()
+            profiler.start()
+    except Exception as e:
+        # Another profiler is already active on this thread, or pyinstrument is not installed
+        logger.error(f"Could not start {profiler_name} for {request.path}: {str(e)}")
+        return
+
+    g._request_profile = (profiler_name, profiler, time.perf_counter())
+
+
+def finish_request_profile(response):
+    state = g.pop('_request_profile', None)
+    if state is None:
+        return response
+
+    profiler_name, profiler, started = state
+    elapsed = time.perf_counter() - started
+
+    directory = current_app.config.get('REQUEST_PROFILE_DIR') or 'profiles'
+    os.makedirs(directory, exist_ok=True)
+    base_path = os.path.join(
+        directory,
+        f"{datetime.now().strftime('%Y%m%d%H%M%S')}_{request.endpoint or 'unknown'}_{uuid.uuid4().hex[:6]}"
+    )
+
+    if profiler_name == 'cprofile':
+        profiler.disable()
+        path = f"{base_path}.prof"
+        profiler.dump_stats(path)
+        summary = io.StringIO()
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(15)
+        logger.info(f"Profile of {request.method} {request.path}:\n{summary.getvalue()}")
+    else:
+        profiler.stop()
+        path = f"{base_path}.html"
+        with open(path, 'w') as f:
+            f.write(profiler.output_html())
+
+    logger.info(f"Profiled {request.method} {request.path} in {elapsed * 1000:.1f}ms, report at {path}")
+    response.headers['X-Profile-Path'] = path
+    return response
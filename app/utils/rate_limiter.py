@@ -0,0 +1,208 @@
+import json
+import time
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+# Graph API error codes that mean a rate or publishing limit was hit
+RATE_LIMIT_ERROR_CODES = {4, 17, 32, 613, 80002, 9}
+
+
+class RateLimitExceeded(Exception):
+    """Raised when no call budget frees up within the allowed wait"""
+
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class TokenBucket:
+    """
+    Token bucket refilled continuously at capacity tokens per period
+    Usage reported by the server can cap the tokens left and block the
+    bucket entirely until a given time
+    """
+
+    def __init__(self, capacity, period=3600):
+        self.capacity = float(capacity)
+        self.rate = self.capacity / period
+        self.tokens = self.capacity
+        self.blocked_until = 0.0
+        self.usage = 0.0
+        self.updated = time.monotonic()
+
+    def wait_time(self, now=None):
+        """Seconds until a token is available"""
+        now = now or time.monotonic()
+        self._refill(now)
+        if self.blocked_until > now:
+            return self.blocked_until - now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def take(self):
+        self.tokens -= 1
+
+    def apply_usage(self, percent, regain_seconds=None, threshold=90):
+        """Cap the remaining tokens to the share of budget the server says is left"""
+        now = time.monotonic()
+        self._refill(now)
+        self.usage = percent
+        self.tokens = min(self.tokens, self.capacity * max(0.0, 100 - percent) / 100)
+        if percent >= threshold:
+            # Graph usage is a rolling one hour window, so wait for it to drain
+            self.blocked_until = max(self.blocked_until, now + (regain_seconds or 300))
+
+    def block(self, seconds):
+        self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+    def snapshot(self):
+        now = time.monotonic()
+        self._refill(now)
+        return {
+            'capacity': self.capacity,
+            'tokens': round(self.tokens, 2),
+            'usage_percent': self.usage,
+            'blocked_for': round(max(0.0, self.blocked_until - now), 1)
+        }
+
+    def _refill(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+
+class RateLimitGovernor:
+    """
+    Shared call budget for the Graph API
+    Keeps one token bucket for the app and one per account, fed by the
+    X-App-Usage and X-Business-Use-Case-Usage response headers. Callers
+    wait for budget instead of failing when a limit is close.
+    """
+
+    def __init__(self, app_calls_per_hour=4800, account_calls_per_hour=200, usage_threshold=90, max_wait=30):
+        self.account_calls_per_hour = account_calls_per_hour
+        self.usage_threshold = usage_threshold
+        self.max_wait = max_wait
+        self.app_bucket = TokenBucket(app_calls_per_hour)
+        self.account_buckets = {}
+        self._lock = threading.Lock()
+
+    def acquire(self, account_key=None, max_wait=None):
+        """
+        Wait until both the app and the account have budget, then spend one call
+        Raises RateLimitExceeded if that would take longer than max_wait seconds
+        """
+        max_wait = self.max_wait if max_wait is None else max_wait
+        deadline = time.monotonic() + max_wait
+
+        while True:
+            with self._lock:
+                buckets = [self.app_bucket]
+                if account_key:
+                    buckets.append(self._account_bucket(account_key))
+                wait = max(bucket.wait_time() for bucket in buckets)
+                if wait <= 0:
+                    for bucket in buckets:
+                        bucket.take()
+                    return
+
+            if time.monotonic() + wait > deadline:
+                raise RateLimitExceeded(
+                    f"Graph API budget exhausted for {account_key or 'app'}, retry in {wait:.0f}s",
+                    retry_after=wait
+                )
+            time.sleep(min(wait, 1.0))
+
+    def wait_time(self, account_key=None):
+        """Seconds until a call for this account could go out"""
+        with self._lock:
+            wait = self.app_bucket.wait_time()
+            if account_key:
+                wait = max(wait, self._account_bucket(account_key).wait_time())
+            return wait
+
+    def order(self, items, key):
+        """Sort queued items so accounts with budget available go first"""
+        return sorted(items, key=lambda item: self.wait_time(key(item)))
+
+    def record_response(self, account_key, response):
+        """Update budgets from the usage headers and error of a Graph API response"""
+        app_usage = _parse_header(response.headers.get('X-App-Usage'))
+        business_usage = _parse_header(response.headers.get('X-Business-Use-Case-Usage'))
+
+        with self._lock:
+            if app_usage:
+                self.app_bucket.apply_usage(_max_percent(app_usage), threshold=self.usage_threshold)
+
+            if business_usage and account_key:
+                entries = [entry for value in business_usage.values() for entry in value]
+                if entries:
+                    percent = max(_max_percent(entry) for entry in entries)
+                    regain = max((entry.get('estimated_time_to_regain_access') or 0) for entry in entries) * 60
+                    self._account_bucket(account_key).apply_usage(percent, regain, self.usage_threshold)
+
+            if response.status_code in (400, 403, 429) and is_rate_limit_error(response):
+                # Throttled without usable headers, back off the account (or app) for a while
+                bucket = self._account_bucket(account_key) if account_key else self.app_bucket
+                bucket.block(float(response.headers.get('Retry-After') or 60))
+
+    def budget(self):
+        """Return the current app and per-account budgets"""
+        with self._lock:
+            return {
+                'app': self.app_bucket.snapshot(),
+                'accounts': {key: bucket.snapshot() for key, bucket in self.account_buckets.items()}
+            }
+
+    def _account_bucket(self, account_key):
+        bucket = self.account_buckets.get(account_key)
+        if bucket is None:
+            bucket = self.account_buckets[account_key] = TokenBucket(self.account_calls_per_hour)
+        return bucket
+
+
+def is_rate_limit_error(response):
+    """Check whether a Graph API response is a throttling error"""
+    try:
+        code = response.json().get('error', {}).get('code')
+    except ValueError:
+        return False
+    return code in RATE_LIMIT_ERROR_CODES
+
+
+def _parse_header(value):
+    if not value:
+        return None
+    try:
+        return json.loads(value)
+    except ValueError:
+        logger.warning(f"Could not parse Graph API usage header: {value}")
+        return None
+
+
+def _max_percent(usage):
+    return max(
+        float(usage.get(field) or 0)
+        for field in ('call_count', 'total_time', 'total_cputime')
+    )
+
+
+_governor = None
+_governor_lock = threading.Lock()
+
+
+def get_governor(config):
+    """Return the process-wide governor, creating it from config on first use"""
+    global _governor
+
+    with _governor_lock:
+        if _governor is None:
+            _governor = RateLimitGovernor(
+                app_calls_per_hour=config.get('GRAPH_APP_CALLS_PER_HOUR', 4800),
+                account_calls_per_hour=config.get('GRAPH_ACCOUNT_CALLS_PER_HOUR', 200),
+                usage_threshold=config.get('GRAPH_USAGE_THRESHOLD', 90),
+                max_wait=config.get('GRAPH_RATE_LIMIT_MAX_WAIT', 30)
+            )
+        return _governor
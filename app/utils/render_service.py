@@ -0,0 +1,118 @@
+import logging
+import os
+import threading
+from concurrent.futures import Future, ProcessPoolExecutor
+from app.utils.metrics import capture_stages, current_metrics_account, observe_stage
+
+logger = logging.getLogger(__name__)
+
+
+class RenderQueueFull(Exception):
+    """Raised when a render job cannot be queued within the timeout"""
+
+
+def render_job(text, image_path, background_style, seed, output_folder, image_cache_folder):
+    """Run one render in a worker process; returns the image path and the stage timings recorded there"""
+    from app.utils.instagram_scheduler import create_image_with_text
+
+    with capture_stages() as timings:
+        output_path = create_image_with_text(text, image_path, background_style, seed, output_folder, image_cache_folder)
+    return output_path, timings
+
+
+class RenderService:
+    """
+    Fans image render jobs out over a process pool
+    Jobs run create_image_with_text in worker processes and resolve to the
+    output image path (or None on failure). At most max_queue jobs may be
+    queued or running at once; further submits block until a slot frees up.
+    The pool is started lazily on the first submit. Stage timings from the
+    workers are recorded in this process, labelled with the submitter's account.
+    """
+
+    def __init__(self, max_workers=None, max_queue=64):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.output_folder = None
+        self.image_cache_folder = ''
+        self.background_style = 'linear'
+        self._executor = None
+        self._slots = threading.BoundedSemaphore(max_queue)
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Read pool settings and render defaults from app config"""
+        self.max_workers = app.config.get('RENDER_POOL_WORKERS') or os.cpu_count()
+        self.max_queue = app.config.get('RENDER_QUEUE_SIZE', 64)
+        self._slots = threading.BoundedSemaphore(self.max_queue)
+        self.output_folder = app.config['UPLOAD_FOLDER']
+        self.image_cache_folder = app.config.get('IMAGE_CACHE_DIR') or ''
+        self.background_style = app.config.get('GRADIENT_STYLE', 'linear')
+
+    def submit(self, text, image_path=None, background_style=None, seed=None, timeout=None):
+        """
+        Queue one render job and return a Future resolving to the image path
+        Raises RenderQueueFull if no slot frees up within timeout seconds
+        """
+        if not self._slots.acquire(timeout=timeout):
+            raise RenderQueueFull(f"Render queue is full ({self.max_queue} jobs)")
+
+        try:
+            job = self._get_executor().submit(
+                render_job,
+                text,
+                image_path,
+                background_style or self.background_style,
+                seed,
+                self.output_folder,
+                self.image_cache_folder
+            )
+        except Exception:
+            self._slots.release()
+            raise
+
+        future = Future()
+        account = current_metrics_account()
+
+        def finish(job):
+            self._slots.release()
+            if job.cancelled():
+                future.cancel()
+                return
+            try:
+                output_path, timings = job.result()
+            except BaseException as e:
+                future.set_exception(e)
+                return
+            for stage, seconds, backend in timings:
+                observe_stage(stage, seconds, backend, account)
+            future.set_result(output_path)
+
+        job.add_done_callback(finish)
+        return future
+
+    def render_batch(self, jobs, timeout=None):
+        """
+        Queue several render jobs, each a dict of submit() keyword arguments
+        Returns the futures in job order
+        """
+        return [self.submit(timeout=timeout, **job) for job in jobs]
+
+    def shutdown(self, wait=True):
+        """Stop the worker processes, letting queued jobs finish when wait is set"""
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=wait, cancel_futures=not wait)
+            logger.info("Render pool shut down")
+
+    @property
+    def running(self):
+        return self._executor is not None
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                logger.info(f"Render pool started with {self.max_workers} workers")
+            return self._executor
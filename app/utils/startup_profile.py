@@ -0,0 +1,111 @@
+"""
+Startup profiling
+
+Run from the repository root to see which imports and startup phases make
+create_app slow:
+
+    python -m app.utils.startup_profile [--config production] [--top 25]
+"""
+import os
+import re
+import sys
+import time
+import argparse
+import subprocess
+from collections import defaultdict
+
+# One line of `python -X importtime` output: self and cumulative microseconds, indented module name
+IMPORT_TIME_LINE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|( *)(\S+)$')
+
+
+class StartupTimer:
+    """Records the time spent in each named phase of application startup"""
+
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self.started = self.last = time.perf_counter()
+        self.phases = []
+
+    def mark(self, phase):
+        """Close the phase that ran since the previous mark"""
+        if not self.enabled:
+            return
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
+
+    def report(self, logger):
+        if not self.enabled:
+            return
+        phases = ', '.join(f"{phase} {seconds * 1000:.0f}ms" for phase, seconds in self.phases)
+        logger.info(f"Startup took {(self.last - self.started) * 1000:.0f}ms: {phases}")
+
+
+def parse_import_times(output):
+    """
+    Parse `python -X importtime` output
+    Returns a list of (module, self_us, cumulative_us, depth) in import order
+    """
+    imports = []
+    for line in output.splitlines():
+        match = IMPORT_TIME_LINE.match(line)
+        if match:
+            self_us, cumulative_us, indent, module = match.groups()
+            imports.append((module, int(self_us), int(cumulative_us), len(indent) // 2))
+    return imports
+
+
+def profile_startup(config_name='development', top=25):
+    """
+    Create the app in a fresh interpreter with -X importtime and print a
+    report of the slowest imports, time per top-level package and the
+    startup phases recorded by StartupTimer
+    """
+    root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    code = (
+        "import logging, time\n"
+        "logging.basicConfig(level=logging.INFO, format='%(message)s')\n"
+        "started = time.perf_counter()\n"
+        "from app import create_app, shutdown_services\n"
+        f"create_app({config_name!r})\n"
+        "print(f'create_app total {(time.perf_counter() - started) * 1000:.0f}ms')\n"
+        "shutdown_services()\n"
+    )
+    env = dict(os.environ, STARTUP_PROFILE='true')
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', code],
+        cwd=root, env=env, capture_output=True, text=True
+    )
+
+    imports = parse_import_times(result.stderr)
+    other_output = [line for line in result.stderr.splitlines() if not line.startswith('import time:')]
+
+    print(f"Slowest imports (cumulative, top {top}):")
+    for module, self_us, cumulative_us, depth in sorted(imports, key=lambda item: -item[2])[:top]:
+        print(f"  {cumulative_us / 1000:8.1f}ms  {self_us / 1000:7.1f}ms self  {module}")
+
+    by_package = defaultdict(int)
+    for module, self_us, _, _ in imports:
+        by_package[module.split('.')[0]] += self_us
+
+    print(f"\nImport time by top-level package (top {top}):")
+    for package, self_us in sorted(by_package.items(), key=lambda item: -item[1])[:top]:
+        print(f"  {self_us / 1000:8.1f}ms  {package}")
+
+    print(f"\nTotal import time: {sum(by_package.values()) / 1000:.1f}ms")
+    for line in result.stdout.splitlines() + other_output:
+        print(line)
+
+    return result.returncode
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Report per-module import time and startup phases of create_app')
+    parser.add_argument('--config', default=os.environ.get('FLASK_ENV', 'development'))
+    parser.add_argument('--top', type=int, default=25)
+    args = parser.parse_args()
+    sys.exit(profile_startup(args.config, args.top))
+
+
+if __name__ == '__main__':
+    main()
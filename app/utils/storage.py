@@ -0,0 +1,220 @@
+import os
+import uuid
+import shutil
+import hashlib
+import logging
+import mimetypes
+import threading
+from collections import OrderedDict
+from abc import ABC, abstractmethod
+from flask import current_app
+from app.utils.metrics import time_stage
+
+logger = logging.getLogger(__name__)
+
+# Read size used when hashing and copying files
+CHUNK_SIZE = 1024 * 1024
+
+# Entries kept in each backend's content-hash and known-blob memos
+MAX_MEMO_ENTRIES = 4096
+
+
+class StorageBackend(ABC):
+    """
+    Base class for places that host post images at a public URL
+    Blobs are named by the SHA-256 of their content, so the same image is
+    only ever stored once no matter how often it is published or retried
+    """
+
+    # Backend label on the blob_upload stage metrics
+    backend_name = 'storage'
+
+    def __init__(self):
+        # Least recently used first, trimmed to MAX_MEMO_ENTRIES
+        self._hashes = OrderedDict()
+        self._known = OrderedDict()
+        self._lock = threading.Lock()
+
+    def url_for_file(self, path):
+        """Store the file if it is not stored yet and return its public URL"""
+        name = self.blob_name(path)
+
+        with self._lock:
+            known = name in self._known
+            if known:
+                self._known.move_to_end(name)
+
+        if not known:
+            with time_stage('blob_upload', self.backend_name):
+                if self.exists(name):
+                    logger.info(f"Skipping upload of {path}, {name} already stored")
+                else:
+                    self.upload(path, name)
+            with self._lock:
+                _remember(self._known, name, True)
+
+        return self.public_url(name)
+
+    def blob_name(self, path):
+        """Content-addressed name for a file, cached by path, size and mtime"""
+        stat = os.stat(path)
+        key = (os.path.abspath(path), stat.st_size, stat.st_mtime_ns)
+
+        with self._lock:
+            name = self._hashes.get(key)
+            if name:
+                self._hashes.move_to_end(key)
+                return name
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        name = f"{digest.hexdigest()}{os.path.splitext(path)[1].lower() or '.jpg'}"
+
+        with self._lock:
+            _remember(self._hashes, key, name)
+        return name
+
+    @abstractmethod
+    def exists(self, name):
+        """Whether a blob with this name is already stored"""
+
+    @abstractmethod
+    def upload(self, path, name):
+        """Store the file at path under name"""
+
+    @abstractmethod
+    def public_url(self, name):
+        """Public URL Instagram can fetch the named blob from"""
+
+
+def _remember(memo, key, value):
+    """Add an entry to an LRU memo, dropping the oldest beyond MAX_MEMO_ENTRIES"""
+    memo[key] = value
+    memo.move_to_end(key)
+    if len(memo) > MAX_MEMO_ENTRIES:
+        memo.popitem(last=False)
+
+
+class AzureBlobStorage(StorageBackend):
+    """Azure Blob Storage backend holding one client for the whole process"""
+
+    backend_name = 'azure_blob'
+
+    def __init__(self, connection_string, container, max_block_size=4 * 1024 * 1024, max_concurrency=4):
+        super().__init__()
+        from azure.storage.blob import BlobServiceClient
+
+        # Files above max_single_put_size are streamed as blocks of max_block_size
+        self.service_client = BlobServiceClient.from_connection_string(
+            connection_string,
+            max_single_put_size=max_block_size,
+            max_block_size=max_block_size
+        )
+        self.container_client = self.service_client.get_container_client(container)
+        self.max_concurrency = max_concurrency
+
+    def exists(self, name):
+        return self.container_client.get_blob_client(name).exists()
+
+    def upload(self, path, name):
+        from azure.core.exceptions import ResourceExistsError
+        from azure.storage.blob import ContentSettings
+
+        content_type = mimetypes.guess_type(name)[0] or 'image/jpeg'
+        try:
+            with open(path, 'rb') as data:
+                self.container_client.upload_blob(
+                    name=name,
+                    data=data,
+                    length=os.path.getsize(path),
+                    overwrite=False,
+                    max_concurrency=self.max_concurrency,
+                    content_settings=ContentSettings(content_type=content_type)
+                )
+        except ResourceExistsError:
+            # Another worker uploaded the same content first
+            pass
+
+    def public_url(self, name):
+        return f"{self.container_client.url}/{name}"
+
+
+class LocalStorage(StorageBackend):
+    """
+    Local filesystem backend for development and offline testing
+    Files are copied into a directory served at base_url, e.g. the Flask
+    static folder or any static file server
+    """
+
+    backend_name = 'local'
+
+    def __init__(self, directory, base_url):
+        super().__init__()
+        self.directory = directory
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(directory, exist_ok=True)
+
+    def exists(self, name):
+        return os.path.exists(os.path.join(self.directory, name))
+
+    def upload(self, path, name):
+        target = os.path.join(self.directory, name)
+        # Unique per upload, as threads in one process may store the same blob at once
+        partial = f"{target}.{uuid.uuid4().hex}.part"
+
+        # Copy under a temporary name so readers never see half-written files
+        try:
+            with open(path, 'rb') as src, open(partial, 'wb') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+            os.replace(partial, target)
+        except BaseException:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+
+    def public_url(self, name):
+        return f"{self.base_url}/{name}"
+
+
+_storage = None
+_storage_pid = None
+_storage_lock = threading.Lock()
+
+
+def create_storage(config):
+    """Build the storage backend selected by STORAGE_BACKEND"""
+    backend = config.get('STORAGE_BACKEND') or ('azure' if config.get('AZURE_STORAGE_CONNECTION_STRING') else 'local')
+
+    if backend == 'azure':
+        return AzureBlobStorage(
+            config['AZURE_STORAGE_CONNECTION_STRING'],
+            config.get('AZURE_STORAGE_CONTAINER', 'instagram-images'),
+            max_block_size=config.get('STORAGE_BLOCK_SIZE', 4 * 1024 * 1024),
+            max_concurrency=config.get('STORAGE_UPLOAD_CONCURRENCY', 4)
+        )
+    if backend == 'local':
+        return LocalStorage(config['STORAGE_LOCAL_DIR'], config['STORAGE_PUBLIC_BASE_URL'])
+
+    raise ValueError(f"Unknown storage backend {backend}")
+
+
+def get_storage():
+    """Return the process-wide storage backend, creating it from app config"""
+    global _storage, _storage_pid
+
+    with _storage_lock:
+        if _storage is None or _storage_pid != os.getpid():
+            _storage = create_storage(current_app.config)
+            _storage_pid = os.getpid()
+        return _storage
+
+
+def reset_storage():
+    """Drop the shared backend, e.g. after changing config"""
+    global _storage, _storage_pid
+
+    with _storage_lock:
+        _storage = None
+        _storage_pid = None
@@ -0,0 +1,209 @@
+import time
+import random
+import logging
+import threading
+from collections import namedtuple
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from app.models.models import ContentTemplate
+
+logger = logging.getLogger(__name__)
+
+# Sampling attempts before scanning for a template that is off cooldown
+MAX_COOLDOWN_REJECTIONS = 8
+
+
+class TemplateEntry(namedtuple('TemplateEntry', [
+    'id', 'name', 'prompt', 'content_type', 'active', 'weight', 'cooldown_seconds'
+])):
+    """Plain snapshot of a content template, safe to share across threads"""
+
+
+class AliasTable:
+    """
+    Walker's alias method: weighted random choice in O(1) per sample
+    Built in O(n) from non-negative weights with a positive sum; sample()
+    returns an index into the weights it was built from
+    """
+
+    def __init__(self, weights):
+        count = len(weights)
+        total = float(sum(weights))
+        scaled = [weight * count / total for weight in weights]
+        self.probability = [1.0] * count
+        self.alias = list(range(count))
+
+        small = [i for i, value in enumerate(scaled) if value < 1.0]
+        large = [i for i, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            self.probability[less] = scaled[less]
+            self.alias[less] = more
+            scaled[more] += scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # Whatever is left is 1.0 up to rounding and keeps its own column
+
+    def __len__(self):
+        return len(self.probability)
+
+    def sample(self, rng=random):
+        column = int(rng.random() * len(self.probability))
+        return column if rng.random() < self.probability[column] else self.alias[column]
+
+
+class TemplateIndex:
+    """
+    In-memory index of content templates for prompt resolution
+    Active templates are grouped by content type, each group with an alias
+    table over the template weights, so a random pick is O(1) and never
+    touches the database. A template with a cooldown is not picked again
+    in this process until cooldown_seconds have passed, unless every
+    template of its type is cooling down.
+    The index is dropped whenever a template is written in this process and
+    rebuilt on the next lookup; after cache_seconds it is rebuilt on a
+    background thread to pick up changes made elsewhere, while lookups keep
+    using the current one.
+    """
+
+    def __init__(self, cache_seconds=300):
+        self.cache_seconds = cache_seconds
+        self._app = None
+        self._templates = None
+        self._groups = None
+        self._loaded_at = 0
+        self._version = 0
+        self._last_used = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._refreshing = False
+
+    def init_app(self, app):
+        self._app = app
+        self.cache_seconds = app.config.get('TEMPLATE_INDEX_CACHE_SECONDS', 300)
+
+    def get(self, template_id):
+        """Template snapshot by id, active or not, or None"""
+        templates, _ = self._current()
+        return templates.get(int(template_id))
+
+    def pick(self, content_type, rng=random):
+        """Weighted random active template of a content type, or None if it has none"""
+        _, groups = self._current()
+        group = groups.get(content_type)
+        if group is None:
+            return None
+
+        entries, table = group
+        now = time.monotonic()
+        for _ in range(MAX_COOLDOWN_REJECTIONS):
+            entry = entries[table.sample(rng)]
+            if self._claim(entry, now):
+                return entry
+
+        # Mostly cooling down: choose among the rest, or ignore cooldowns if none are left
+        available = [entry for entry in entries if self._available(entry, now)]
+        entry = rng.choices(available, [entry.weight for entry in available])[0] if available else entries[table.sample(rng)]
+        self._claim(entry, now, force=True)
+        return entry
+
+    def invalidate(self):
+        """Drop the index; the next lookup rebuilds it from the database"""
+        with self._lock:
+            self._templates = None
+            self._groups = None
+            self._version += 1
+
+    def _claim(self, entry, now, force=False):
+        if not entry.cooldown_seconds:
+            return True
+        with self._lock:
+            if not force and now - self._last_used.get(entry.id, float('-inf')) < entry.cooldown_seconds:
+                return False
+            self._last_used[entry.id] = now
+            return True
+
+    def _available(self, entry, now):
+        return not entry.cooldown_seconds or now - self._last_used.get(entry.id, float('-inf')) >= entry.cooldown_seconds
+
+    def _current(self):
+        with self._lock:
+            templates, groups = self._templates, self._groups
+            stale = templates is not None and time.monotonic() - self._loaded_at >= self.cache_seconds
+        if templates is None:
+            return self._load()
+        if stale:
+            self._refresh_async()
+        return templates, groups
+
+    def _load(self, force=False):
+        with self._load_lock:
+            with self._lock:
+                if self._templates is not None and not force:
+                    return self._templates, self._groups
+                version = self._version
+
+            templates = {template.id: self._snapshot(template) for template in ContentTemplate.query.all()}
+            groups = self._build_groups(templates.values())
+            with self._lock:
+                # A write during the query leaves the index dropped for the next lookup
+                if self._version == version:
+                    self._templates, self._groups = templates, groups
+                    self._loaded_at = time.monotonic()
+            return templates, groups
+
+    def _refresh_async(self):
+        with self._lock:
+            if self._refreshing:
+                return
+            self._refreshing = True
+            # Stale lookups keep the current index until the reload lands
+            self._loaded_at = time.monotonic()
+
+        threading.Thread(target=self._refresh_in_background, args=(self._get_app(),), name='template-index-refresh', daemon=True).start()
+
+    def _refresh_in_background(self, app):
+        try:
+            with app.app_context():
+                self._load(force=True)
+        except Exception as e:
+            logger.error(f"Template index refresh failed: {str(e)}")
+        finally:
+            with self._lock:
+                self._refreshing = False
+
+    def _get_app(self):
+        if has_app_context():
+            return current_app._get_current_object()
+        return self._app
+
+    @staticmethod
+    def _build_groups(templates):
+        by_type = {}
+        for entry in templates:
+            if entry.active and entry.weight > 0:
+                by_type.setdefault(entry.content_type, []).append(entry)
+        return {
+            content_type: (entries, AliasTable([entry.weight for entry in entries]))
+            for content_type, entries in by_type.items()
+        }
+
+    @staticmethod
+    def _snapshot(template):
+        # Columns added by upgrade_schema are NULL on older rows
+        return TemplateEntry(
+            template.id, template.name, template.prompt, template.content_type, bool(template.active),
+            1.0 if template.weight is None else float(template.weight),
+            template.cooldown_seconds or 0
+        )
+
+
+# Shared by every thread in this process
+template_index = TemplateIndex()
+
+
+def _invalidate_templates(mapper, connection, target):
+    template_index.invalidate()
+
+
+for _event_name in ('after_insert', 'after_update', 'after_delete'):
+    event.listen(ContentTemplate, _event_name, _invalidate_templates)
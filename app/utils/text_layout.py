@@ -0,0 +1,83 @@
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+from PIL import ImageFont
+
+DEFAULT_FONT_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'static', 'fonts', 'roboto-bold.ttf')
+
+# Line advance as a multiple of the font size
+LINE_SPACING = 1.25
+
+TextLayout = namedtuple('TextLayout', ['font_size', 'line_height', 'lines', 'fits'])
+
+
+@lru_cache(maxsize=32)
+def get_font(font_path=DEFAULT_FONT_PATH, size=40):
+    """
+    Load a font once per (path, size)
+    Falls back to Pillow's default font if the file is missing or unreadable
+    """
+    try:
+        if font_path and os.path.exists(font_path):
+            return ImageFont.truetype(font_path, size=size)
+    except Exception:
+        pass
+
+    try:
+        return ImageFont.load_default(size=size)
+    except TypeError:
+        # Pillow < 10.1 only ships a fixed-size bitmap default
+        return ImageFont.load_default()
+
+
+@lru_cache(maxsize=1024)
+def layout_text(text, font_path=DEFAULT_FONT_PATH, font_size=40, box_width=980, box_height=980, min_font_size=20):
+    """
+    Wrap text into lines that fit box_width using real glyph widths
+    Shrinks the font in steps until the wrapped block fits box_height or
+    min_font_size is reached. Results are memoized by (text, font, box).
+    Returns a TextLayout whose lines are (line, width) pairs
+    """
+    words = text.split()
+    size = font_size
+
+    while True:
+        font = get_font(font_path, size)
+        lines = _wrap(words, font, box_width)
+        line_height = round(size * LINE_SPACING)
+        fits = (
+            len(lines) * line_height <= box_height
+            and all(width <= box_width for _, width in lines)
+        )
+
+        if fits or size <= min_font_size:
+            return TextLayout(size, line_height, tuple(lines), fits)
+
+        size = max(min_font_size, int(size * 0.9))
+
+
+def _wrap(words, font, box_width):
+    """Greedy word wrap measuring each word once"""
+    space_width = font.getlength(' ')
+    lines = []
+    line_words = []
+    line_width = 0
+
+    for word in words:
+        word_width = font.getlength(word)
+        candidate_width = line_width + space_width + word_width if line_words else word_width
+
+        if line_words and candidate_width > box_width:
+            lines.append(' '.join(line_words))
+            line_words = [word]
+            line_width = word_width
+        else:
+            line_words.append(word)
+            line_width = candidate_width
+
+    if line_words:
+        lines.append(' '.join(line_words))
+
+    # Measure the final lines so kerning is reflected when centering
+    return [(line, font.getlength(line)) for line in lines]
@@ -0,0 +1,76 @@
+"""
+Compare one-client-per-call sequential generation with the shared async runner
+
+Runs against the local mock Azure OpenAI server, so no credentials or
+network access are needed:
+
+    python -m benchmarks.bench_azure_generation [--requests 40] [--latency 0.2] [--concurrency 8]
+"""
+import argparse
+import time
+
+from flask import Flask
+
+from app.utils.azure_openai import build_messages, get_completion_runner, reset_azure_openai_clients
+from benchmarks.mock_azure_openai import start_mock_server
+
+API_VERSION = '2024-02-01'
+
+
+def per_call_clients(endpoint, prompts):
+    """The original path: a new AzureOpenAI client for every blocking call"""
+    from openai import AzureOpenAI
+
+    results = []
+    for prompt in prompts:
+        client = AzureOpenAI(api_key='mock', api_version=API_VERSION, azure_endpoint=endpoint)
+        response = client.chat.completions.create(
+            model='gpt-4',
+            messages=build_messages(prompt, 'caption'),
+            max_tokens=150,
+            temperature=0.7
+        )
+        results.append(response.choices[0].message.content)
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--requests', type=int, default=40)
+    parser.add_argument('--latency', type=float, default=0.2)
+    parser.add_argument('--concurrency', type=int, default=8)
+    args = parser.parse_args()
+
+    server, endpoint = start_mock_server(latency=args.latency)
+    prompts = [f"Date: today\nPrompt: caption {i}" for i in range(args.requests)]
+
+    app = Flask(__name__)
+    app.config.update(
+        AZURE_OPENAI_API_KEY='mock',
+        AZURE_OPENAI_API_VERSION=API_VERSION,
+        AZURE_OPENAI_ENDPOINT=endpoint,
+        AZURE_OPENAI_MAX_CONCURRENCY=args.concurrency
+    )
+
+    started = time.perf_counter()
+    per_call_clients(endpoint, prompts)
+    sequential = time.perf_counter() - started
+
+    with app.app_context():
+        runner = get_completion_runner()
+        requests = [(build_messages(prompt, 'caption'), 150) for prompt in prompts]
+
+        started = time.perf_counter()
+        results = runner.complete_many(requests, 'gpt-4')
+        concurrent = time.perf_counter() - started
+        reset_azure_openai_clients()
+
+    server.shutdown()
+    failed = sum(result is None for result in results)
+    print(f"{args.requests} completions at {args.latency * 1000:.0f}ms latency")
+    print(f"  new client per call, sequential: {sequential:6.2f}s")
+    print(f"  shared async client, {args.concurrency} in flight: {concurrent:6.2f}s ({sequential / concurrent:.1f}x, {failed} failed)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,57 @@
+"""
+Compare the per-row ImageDraw gradient against the vectorized background engine
+
+    python -m benchmarks.bench_gradient [--repeat 20]
+"""
+import argparse
+import random
+import timeit
+
+from PIL import Image, ImageDraw
+
+from app.utils.backgrounds import GRADIENT_STYLES, create_gradient_background
+
+WIDTH, HEIGHT = 1080, 1080
+
+
+def legacy_gradient(width=WIDTH, height=HEIGHT):
+    """The original one-line-per-row gradient from create_image_with_text"""
+    img = Image.new('RGB', (width, height), color=(random.randint(0, 255),
+                                                  random.randint(0, 255),
+                                                  random.randint(0, 255)))
+    draw = ImageDraw.Draw(img)
+    for i in range(height):
+        r = int((i / height) * 255)
+        g = int(((height - i) / height) * 255)
+        b = random.randint(0, 255)
+        draw.line([(0, i), (width, i)], fill=(r, g, b, 128))
+    return img
+
+
+def check_same_look():
+    """The linear style must reproduce the legacy red/green ramp on every row"""
+    legacy = legacy_gradient()
+    vectorized = create_gradient_background(WIDTH, HEIGHT, style='linear', seed=0).convert('RGB')
+    for y in (0, HEIGHT // 3, HEIGHT // 2, HEIGHT - 1):
+        old = legacy.getpixel((WIDTH // 2, y))
+        new = vectorized.getpixel((WIDTH // 2, y))
+        assert old[:2] == new[:2], f"row {y}: legacy {old} != vectorized {new}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    check_same_look()
+
+    legacy = min(timeit.repeat(legacy_gradient, number=1, repeat=args.repeat))
+    print(f"{'legacy':<12} {legacy * 1000:8.2f} ms")
+
+    for style in GRADIENT_STYLES:
+        elapsed = min(timeit.repeat(lambda: create_gradient_background(style=style), number=1, repeat=args.repeat))
+        print(f"{style:<12} {elapsed * 1000:8.2f} ms  ({legacy / elapsed:5.1f}x)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+"""
+Time the Post hot-path queries on a seeded SQLite database, with and without indexes
+
+    python -m benchmarks.bench_post_queries [--posts 300000] [--db /tmp/bench_posts.db]
+"""
+import os
+import random
+import argparse
+import timeit
+from datetime import datetime, timedelta
+
+from flask import Flask
+from sqlalchemy import text
+
+from app import db
+from app.models.models import Post
+from app.utils.migrations import upgrade_schema
+
+STATUSES = ['published'] * 90 + ['failed'] * 5 + ['draft'] * 4 + ['processing']
+
+
+def create_bench_app(path):
+    app = Flask(__name__)
+    app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{path}"
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    db.init_app(app)
+    return app
+
+
+def seed(count, batch_size=50000):
+    """Insert count posts spread over the last two years"""
+    rng = random.Random(42)
+    now = datetime.now()
+    table = Post.__table__
+
+    for start in range(0, count, batch_size):
+        rows = []
+        for i in range(start, min(start + batch_size, count)):
+            created_at = now - timedelta(minutes=rng.randint(0, 2 * 365 * 24 * 60))
+            status = rng.choice(STATUSES)
+            rows.append({
+                'caption': f"Seeded caption {i}",
+                'image_path': f"/tmp/post_{i}.jpg",
+                'instagram_id': f"ig{i}" if status == 'published' else None,
+                'status': status,
+                'scheduled_time': created_at + timedelta(hours=rng.randint(0, 72)),
+                'created_at': created_at,
+                'updated_at': created_at
+            })
+        db.session.execute(table.insert(), rows)
+        db.session.commit()
+
+
+def hot_queries():
+    """The admin posts page, the due-posts lookup and an instagram_id lookup"""
+    now = datetime.now()
+    return {
+        'admin posts page': lambda: Post.query.order_by(Post.created_at.desc(), Post.id.desc()).limit(50).all(),
+        'admin posts page 100': lambda: Post.query.order_by(Post.created_at.desc(), Post.id.desc()).offset(4950).limit(50).all(),
+        'due posts': lambda: Post.query.filter(
+            Post.status == 'draft', Post.scheduled_time <= now
+        ).order_by(Post.scheduled_time).limit(5).all(),
+        'processing posts': lambda: Post.query.filter(Post.status == 'processing').all(),
+        'by instagram_id': lambda: Post.query.filter_by(instagram_id='ig12345').first()
+    }
+
+
+def drop_post_indexes():
+    for index in Post.__table__.indexes:
+        db.session.execute(text(f"DROP INDEX IF EXISTS {index.name}"))
+    db.session.commit()
+
+
+def measure(repeat):
+    results = {}
+    for name, query in hot_queries().items():
+        db.session.expunge_all()
+        results[name] = min(timeit.repeat(query, number=1, repeat=repeat))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--posts', type=int, default=300000)
+    parser.add_argument('--db', default='/tmp/bench_posts.db')
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    if os.path.exists(args.db):
+        os.remove(args.db)
+
+    app = create_bench_app(args.db)
+    with app.app_context():
+        db.create_all()
+        print(f"Seeding {args.posts} posts...")
+        seed(args.posts)
+
+        drop_post_indexes()
+        before = measure(args.repeat)
+
+        upgrade_schema()
+        db.session.execute(text("ANALYZE"))
+        after = measure(args.repeat)
+
+        print(f"\n{'query':<24} {'no index':>12} {'indexed':>12} {'speed-up':>10}")
+        for name in before:
+            print(f"{name:<24} {before[name] * 1000:10.2f}ms {after[name] * 1000:10.2f}ms {before[name] / after[name]:9.1f}x")
+
+    os.remove(args.db)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,461 @@
+"""
+End-to-end benchmark suite for the hot paths, fully offline
+
+Measures throughput and p50/p95/p99 latency for image rendering (from a
+gradient and from a 12 MP source photo), caption
+generation (tiny local model and mock Azure OpenAI), publish_to_instagram
+(fake Graph API and blob storage), the admin posts page and the /api
+endpoints against seeded SQLite databases. Seeded databases are cached in
+--db-dir and copied for every run, so each run starts from the same data.
+
+Results are written as JSON. When a baseline exists, every scenario is
+compared against it and the run exits with status 1 if any scenario got
+slower than --tolerance allows:
+
+    python -m benchmarks.bench_suite [--sizes 1k,100k,1m] [--scenarios 'api.*,publish.*']
+    python -m benchmarks.bench_suite --sizes 1k --save-baseline
+"""
+import os
+import sys
+import json
+import math
+import time
+import shutil
+import fnmatch
+import argparse
+import platform
+import tempfile
+from datetime import datetime, timedelta
+
+from jinja2 import ChoiceLoader, DictLoader
+from sqlalchemy import text
+
+from app import create_app, db
+from app.models.models import Post, InstagramAccount
+from config.config import config_by_name, TestingConfig
+from benchmarks.bench_post_queries import seed
+from benchmarks.fakes import install_fake_storage, install_tiny_model, start_graph_api
+from benchmarks.mock_azure_openai import start_mock_server
+
+SIZES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+
+# Latency percentiles reported for every scenario
+PERCENTILES = (50, 95, 99)
+
+# Metrics compared against the baseline; True where larger is better
+COMPARED_METRICS = {'p50_ms': False, 'p95_ms': False, 'throughput': True}
+
+# Stand-in for admin/posts.html when the app does not ship one
+ADMIN_POSTS_TEMPLATE = """<h1>{{ title }}</h1>
+<table>
+{% for post in posts %}<tr><td>{{ post.id }}</td><td>{{ post.status }}</td><td>{{ post.caption }}</td><td>{{ post.created_at }}</td></tr>
+{% endfor %}</table>
+{% if pagination.has_next %}<a href="?page={{ pagination.next_num }}">Next</a>{% endif %}"""
+
+CAPTION = "Small steps forward each day lead to massive progress over time. Keep going! #progress #journey"
+
+SCENARIOS = {}
+
+
+def scenario(name, iterations, per_size=True):
+    """Register a scenario; setup(bench, count) prepares count calls and returns the callable to time"""
+    def register(setup):
+        SCENARIOS[name] = {'setup': setup, 'iterations': iterations, 'per_size': per_size}
+        return setup
+    return register
+
+
+def checked(response):
+    if response.status_code != 200:
+        raise RuntimeError(f"{response.request.path} returned {response.status_code}: {response.get_data(as_text=True)[:200]}")
+    # Read the whole body so streamed responses are timed end to end
+    response.get_data()
+    return response
+
+
+@scenario('render.create_image_with_text', iterations=20, per_size=False)
+def render_image(bench, count):
+    from app.utils.instagram_scheduler import create_image_with_text
+
+    return lambda: create_image_with_text(CAPTION, background_style='linear', output_folder=bench.workdir)
+
+
+def write_source_photo(workdir):
+    """A 12 MP phone-sized JPEG to render posts from"""
+    import numpy as np
+    from PIL import Image
+
+    path = os.path.join(workdir, 'source_photo.jpg')
+    if not os.path.exists(path):
+        y, x = np.mgrid[0:3000, 0:4000]
+        pixels = np.stack([(x / 16) % 256, (y / 12) % 256, ((x + y) / 28) % 256], axis=-1).astype(np.uint8)
+        Image.fromarray(pixels).save(path, quality=90)
+    return path
+
+
+@scenario('render.create_image_from_photo', iterations=20, per_size=False)
+def render_from_photo(bench, count):
+    from app.utils.instagram_scheduler import create_image_with_text
+
+    source = write_source_photo(bench.workdir)
+    return lambda: create_image_with_text(CAPTION, source, output_folder=bench.workdir, image_cache_folder='')
+
+
+@scenario('render.create_image_from_cached_photo', iterations=20, per_size=False)
+def render_from_cached_photo(bench, count):
+    from app.utils.instagram_scheduler import create_image_with_text
+
+    source = write_source_photo(bench.workdir)
+    cache_folder = os.path.join(bench.workdir, 'derivatives')
+    return lambda: create_image_with_text(CAPTION, source, output_folder=bench.workdir, image_cache_folder=cache_folder)
+
+
+@scenario('generate.caption_local', iterations=100, per_size=False)
+def generate_local(bench, count):
+    from app.utils.content_generator import generate_caption
+
+    return lambda: generate_caption('caption')
+
+
+@scenario('generate.caption_azure', iterations=50, per_size=False)
+def generate_azure(bench, count):
+    from app.utils.content_generator import generate_caption
+    from app.utils.azure_openai import reset_azure_openai_clients
+
+    bench.app.config.update(
+        AZURE_OPENAI_API_KEY='bench',
+        AZURE_OPENAI_API_VERSION='2024-02-01',
+        AZURE_OPENAI_ENDPOINT=bench.azure_url
+    )
+    reset_azure_openai_clients()
+
+    def teardown():
+        for key in ('AZURE_OPENAI_API_KEY', 'AZURE_OPENAI_API_VERSION', 'AZURE_OPENAI_ENDPOINT'):
+            bench.app.config.pop(key, None)
+        reset_azure_openai_clients()
+
+    bench.teardowns.append(teardown)
+    return lambda: generate_caption('caption')
+
+
+@scenario('api.generate_content', iterations=100, per_size=False)
+def api_generate_content(bench, count):
+    return lambda: checked(bench.client.post('/api/generate-content', json={'content_type': 'caption'}))
+
+
+@scenario('publish.publish_to_instagram', iterations=50)
+def publish(bench, count):
+    from app.utils.instagram_publisher import publish_to_instagram
+
+    account = InstagramAccount(
+        account_name='bench',
+        instagram_user_id='17841400000000000',
+        access_token='bench-token',
+        token_expires_at=datetime.utcnow() + timedelta(days=60)
+    )
+    db.session.add(account)
+    db.session.flush()
+
+    # Distinct image content per post, so every publish uploads a new blob
+    posts = []
+    for i in range(count):
+        path = os.path.join(bench.workdir, f"publish_{i}.jpg")
+        with open(path, 'wb') as f:
+            f.write(os.urandom(64 * 1024))
+        posts.append(Post(caption=CAPTION, image_path=path, status='pending', account_id=account.id))
+    db.session.add_all(posts)
+    db.session.commit()
+
+    pending = iter(posts)
+    return lambda: publish_to_instagram(next(pending))
+
+
+@scenario('admin.posts_page', iterations=200)
+def admin_posts_page(bench, count):
+    return lambda: checked(bench.client.get('/admin/posts'))
+
+
+@scenario('admin.posts_page_deep', iterations=100)
+def admin_posts_page_deep(bench, count):
+    return lambda: checked(bench.client.get('/admin/posts?page=100'))
+
+
+@scenario('api.posts', iterations=200)
+def api_posts(bench, count):
+    return lambda: checked(bench.client.get('/api/posts?limit=50'))
+
+
+@scenario('api.posts_status_filter', iterations=200)
+def api_posts_status_filter(bench, count):
+    return lambda: checked(bench.client.get('/api/posts?status=failed,draft&limit=50'))
+
+
+@scenario('api.posts_cursor', iterations=200)
+def api_posts_cursor(bench, count):
+    from app.utils.post_queries import encode_cursor
+
+    # A cursor 100 pages in, as reached by following next_cursor
+    row = db.session.execute(
+        db.select(Post.created_at, Post.id).order_by(Post.created_at.desc(), Post.id.desc()).offset(min(5000, bench.posts - 1)).limit(1)
+    ).first()
+    cursor = encode_cursor(row.created_at, row.id)
+    return lambda: checked(bench.client.get(f"/api/posts?limit=50&cursor={cursor}"))
+
+
+@scenario('api.posts_export', iterations=20)
+def api_posts_export(bench, count):
+    since = (datetime.now() - timedelta(days=7)).isoformat()
+    return lambda: checked(bench.client.get(f"/api/posts/export?created_after={since}"))
+
+
+@scenario('api.stats', iterations=200)
+def api_stats(bench, count):
+    return lambda: checked(bench.client.get('/api/stats?days=30'))
+
+
+@scenario('api.create_post', iterations=200)
+def api_create_post(bench, count):
+    scheduled_time = (datetime.now() + timedelta(days=1)).isoformat()
+    body = {'caption': CAPTION, 'image_path': '/tmp/bench.jpg', 'scheduled_time': scheduled_time}
+    return lambda: checked(bench.client.post('/api/create-post', json=body))
+
+
+class Bench:
+    """Everything a scenario setup needs: the app, a test client and the fakes"""
+
+    def __init__(self, app, posts, workdir, azure_url):
+        self.app = app
+        self.client = app.test_client()
+        self.posts = posts
+        self.workdir = workdir
+        self.azure_url = azure_url
+        self.teardowns = []
+
+
+def create_bench_app(path, graph_url, workdir):
+    """The real app factory, pointed at a SQLite file and the local fakes"""
+    config_by_name['benchmark'] = type('BenchmarkConfig', (TestingConfig,), {
+        'TESTING': False,
+        'SQLALCHEMY_DATABASE_URI': f"sqlite:///{path}",
+        'UPLOAD_FOLDER': workdir,
+        'INSTAGRAM_GRAPH_API_URL': graph_url,
+        'GRAPH_APP_CALLS_PER_HOUR': 10 ** 9,
+        'GRAPH_ACCOUNT_CALLS_PER_HOUR': 10 ** 9,
+        'CONTENT_GENERATION_MODEL': 'tiny',
+        'MODEL_WARMUP': False,
+        # Measure inference and counters, not the caches in front of them
+        'GENERATION_CACHE_VARIANTS': 0,
+        'STATS_CACHE_SECONDS': 0,
+        'SCHEDULER_IN_APP': False,
+        'AUTO_UPGRADE_SCHEMA': True
+    })
+    app = create_app('benchmark')
+    app.jinja_env.loader = ChoiceLoader([app.jinja_env.loader, DictLoader({'admin/posts.html': ADMIN_POSTS_TEMPLATE})])
+    return app
+
+
+def prepare_database(posts, db_dir, graph_url, workdir):
+    """Seed (once) and copy a database of posts; returns the path of the working copy"""
+    pristine = os.path.join(db_dir, f"bench_posts_{posts}.db")
+    if not os.path.exists(pristine):
+        from app.utils.post_stats import rebuild_post_stats
+
+        print(f"Seeding {posts} posts into {pristine}...", file=sys.stderr)
+        partial = f"{pristine}.part"
+        if os.path.exists(partial):
+            os.remove(partial)
+        app = create_bench_app(partial, graph_url, workdir)
+        with app.app_context():
+            seed(posts)
+            rebuild_post_stats()
+            db.session.execute(text("ANALYZE"))
+            db.session.commit()
+            db.engine.dispose()
+        os.replace(partial, pristine)
+
+    working = os.path.join(workdir, f"posts_{posts}.db")
+    shutil.copyfile(pristine, working)
+    return working
+
+
+def reset_process_caches():
+    """Forget state cached from the previous database"""
+    from app.utils.credentials import credential_manager
+    from app.utils.template_index import template_index
+
+    credential_manager.invalidate()
+    template_index.invalidate()
+
+
+def percentile(sorted_values, percent):
+    """Nearest-rank percentile of an already sorted list"""
+    rank = max(1, math.ceil(percent / 100 * len(sorted_values)))
+    return sorted_values[rank - 1]
+
+
+def measure(operation, iterations, warmup):
+    for _ in range(warmup):
+        operation()
+
+    latencies = []
+    started = time.perf_counter()
+    for _ in range(iterations):
+        call_started = time.perf_counter()
+        operation()
+        latencies.append(time.perf_counter() - call_started)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    result = {
+        'iterations': iterations,
+        'throughput': round(iterations / elapsed, 2),
+        'mean_ms': round(sum(latencies) / iterations * 1000, 3)
+    }
+    for percent in PERCENTILES:
+        result[f"p{percent}_ms"] = round(percentile(latencies, percent) * 1000, 3)
+    return result
+
+
+def run_scenarios(bench, names, label, args):
+    results = {}
+    for name in names:
+        spec = SCENARIOS[name]
+        iterations = args.iterations or spec['iterations']
+        key = f"{name}@{label}" if label else name
+
+        with bench.app.test_request_context():
+            operation = spec['setup'](bench, iterations + args.warmup)
+            try:
+                results[key] = measure(operation, iterations, args.warmup)
+                if label:
+                    results[key]['posts'] = bench.posts
+            finally:
+                while bench.teardowns:
+                    bench.teardowns.pop()()
+                db.session.remove()
+
+        summary = results[key]
+        print(f"{key:<44} {summary['throughput']:>10.1f}/s {summary['p50_ms']:>9.2f} {summary['p95_ms']:>9.2f} {summary['p99_ms']:>9.2f}", file=sys.stderr)
+    return results
+
+
+def compare(results, baseline, tolerance, min_delta_ms):
+    """
+    List the scenarios slower than the baseline
+    A latency only counts as a regression when it grew by more than the
+    tolerance and by at least min_delta_ms, so sub-millisecond noise on
+    fast endpoints does not fail the run
+    """
+    regressions = []
+    for key, result in results.items():
+        previous = baseline.get('results', {}).get(key)
+        if not previous:
+            continue
+        for metric, higher_is_better in COMPARED_METRICS.items():
+            if metric not in previous:
+                continue
+            before, after = previous[metric], result[metric]
+            if higher_is_better:
+                # Sequential throughput is 1 / mean latency; apply the same noise floor to it
+                slower = after < before * (1 - tolerance) and 1000 / after - 1000 / before >= min_delta_ms
+            else:
+                slower = after > before * (1 + tolerance) and after - before >= min_delta_ms
+            if slower:
+                regressions.append(f"{key} {metric}: {before} -> {after}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', default='1k,100k,1m', help=f"comma-separated seeded database sizes from {', '.join(SIZES)}")
+    parser.add_argument('--scenarios', default='*', help='comma-separated name patterns, e.g. "api.*,render.*"')
+    parser.add_argument('--iterations', type=int, default=0, help='timed calls per scenario, 0 for each scenario default')
+    parser.add_argument('--warmup', type=int, default=3)
+    parser.add_argument('--db-dir', default=os.path.join(tempfile.gettempdir(), 'instagram_bench'))
+    parser.add_argument('--output', default='bench_results.json')
+    parser.add_argument('--baseline', default=os.path.join(os.path.dirname(__file__), 'baseline.json'))
+    parser.add_argument('--save-baseline', action='store_true', help='write the results to --baseline instead of comparing')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='allowed slowdown as a fraction of the baseline')
+    parser.add_argument('--min-delta-ms', type=float, default=1.0)
+    parser.add_argument('--fake-latency', type=float, default=0.01, help='seconds per Graph API and blob storage call')
+    parser.add_argument('--azure-latency', type=float, default=0.05, help='seconds per Azure OpenAI completion')
+    parser.add_argument('--token-ms', type=float, default=0.0, help='simulated inference time per token for the tiny model')
+    parser.add_argument('--model', help='real text-generation model instead of the tiny stand-in, e.g. sshleifer/tiny-gpt2')
+    args = parser.parse_args()
+
+    sizes = [size.strip().lower() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in SIZES]
+    if unknown:
+        parser.error(f"unknown sizes: {', '.join(unknown)}")
+    patterns = [pattern.strip() for pattern in args.scenarios.split(',')]
+    names = [name for name in SCENARIOS if any(fnmatch.fnmatch(name, pattern) for pattern in patterns)]
+
+    os.makedirs(args.db_dir, exist_ok=True)
+    graph_server, graph_url = start_graph_api(args.fake_latency)
+    azure_server, azure_url = start_mock_server(latency=args.azure_latency)
+    install_fake_storage(args.fake_latency)
+
+    from app.utils.model_registry import model_registry
+    if not args.model:
+        install_tiny_model(model_registry, args.token_ms / 1000)
+
+    results = {}
+    print(f"{'scenario':<44} {'throughput':>12} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}", file=sys.stderr)
+    with tempfile.TemporaryDirectory(prefix='instagram_bench_') as workdir:
+        for index, size in enumerate(sizes):
+            posts = SIZES[size]
+            path = prepare_database(posts, args.db_dir, graph_url, workdir)
+            app = create_bench_app(path, graph_url, workdir)
+            if args.model:
+                app.config['CONTENT_GENERATION_MODEL'] = args.model
+            reset_process_caches()
+
+            bench = Bench(app, posts, workdir, azure_url)
+            if index == 0:
+                # Paths that do not depend on the amount of stored posts run once
+                results.update(run_scenarios(bench, [n for n in names if not SCENARIOS[n]['per_size']], None, args))
+            results.update(run_scenarios(bench, [n for n in names if SCENARIOS[n]['per_size']], size, args))
+
+            with app.app_context():
+                db.engine.dispose()
+
+    graph_server.shutdown()
+    azure_server.shutdown()
+
+    report = {
+        'created_at': datetime.utcnow().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'options': {'sizes': sizes, 'warmup': args.warmup, 'fake_latency': args.fake_latency,
+                    'azure_latency': args.azure_latency, 'model': args.model or 'tiny', 'token_ms': args.token_ms},
+        'results': results
+    }
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump(report, f, indent=2, sort_keys=True)
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        return 0
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+    print(f"Wrote {args.output}", file=sys.stderr)
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one", file=sys.stderr)
+        return 0
+
+    with open(args.baseline) as f:
+        regressions = compare(results, json.load(f), args.tolerance, args.min_delta_ms)
+    if regressions:
+        print(f"\n{len(regressions)} regressions against {args.baseline}:", file=sys.stderr)
+        for regression in regressions:
+            print(f"  {regression}", file=sys.stderr)
+        return 1
+
+    print(f"No regressions against {args.baseline}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,142 @@
+"""
+Offline stand-ins for the external services used on the hot paths
+
+- a local Graph API server answering media, media_publish, batched
+  container status and token exchange requests
+- an in-memory storage backend in place of Azure Blob Storage
+- a tiny text-generation pipeline in place of a Hugging Face model
+
+The Azure OpenAI stand-in lives in benchmarks.mock_azure_openai. Every fake
+takes a latency in seconds so runs can model a slow network.
+"""
+import os
+import json
+import time
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import urlparse, parse_qs
+
+from app.utils import storage
+from app.utils.storage import StorageBackend
+
+
+class MockGraphAPIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; don't let delayed ACKs stall them
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self._answer()
+
+    def do_POST(self):
+        self._answer()
+
+    def _answer(self):
+        url = urlparse(self.path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+        length = int(self.headers.get('Content-Length', 0))
+        if length:
+            # requests sends params in the query string, but accept a form body too
+            params.update({key: values[0] for key, values in parse_qs(self.rfile.read(length).decode()).items()})
+
+        with self.server.lock:
+            self.server.calls += 1
+            call = self.server.calls
+        time.sleep(self.server.latency)
+
+        if url.path.endswith('/media'):
+            body = {'id': f"container{call}"}
+        elif url.path.endswith('/media_publish'):
+            body = {'id': f"ig{params.get('creation_id', call)}"}
+        elif url.path.endswith('/oauth/access_token'):
+            body = {'access_token': f"token{call}", 'token_type': 'bearer'}
+        else:
+            body = {creation_id: {'id': creation_id, 'status_code': 'FINISHED'} for creation_id in params.get('ids', '').split(',') if creation_id}
+
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def start_graph_api(latency=0.0):
+    """Serve the fake Graph API on a daemon thread; returns (server, base URL)"""
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockGraphAPIHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.calls = 0
+    server.lock = threading.Lock()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/v15.0"
+
+
+class FakeBlobStorage(StorageBackend):
+    """Storage backend keeping blobs in memory, with Azure-like round-trip latency"""
+
+    backend_name = 'fake_blob'
+
+    def __init__(self, latency=0.0, base_url='https://bench.blob.core.windows.net/instagram-images'):
+        super().__init__()
+        self.latency = latency
+        self.base_url = base_url
+        self.blobs = {}
+
+    def exists(self, name):
+        time.sleep(self.latency)
+        return name in self.blobs
+
+    def upload(self, path, name):
+        with open(path, 'rb') as f:
+            data = f.read()
+        time.sleep(self.latency)
+        self.blobs[name] = data
+
+    def public_url(self, name):
+        return f"{self.base_url}/{name}"
+
+
+def install_fake_storage(latency=0.0):
+    """Make get_storage() return a FakeBlobStorage in this process"""
+    backend = FakeBlobStorage(latency)
+    with storage._storage_lock:
+        storage._storage = backend
+        storage._storage_pid = os.getpid()
+    return backend
+
+
+class TinyTextPipeline:
+    """
+    Stand-in for a transformers text-generation pipeline
+    Takes the same call arguments and returns the same output shape,
+    spending token_seconds per generated token to model inference cost
+    """
+
+    class _Tokenizer:
+        pad_token_id = None
+        padding_side = 'right'
+
+    class _Model:
+        class config:
+            eos_token_id = 0
+
+    def __init__(self, token_seconds=0.0):
+        self.token_seconds = token_seconds
+        self.tokenizer = self._Tokenizer()
+        self.model = self._Model()
+
+    def __call__(self, prompts, max_length=50, **kwargs):
+        prompts = [prompts] if isinstance(prompts, str) else prompts
+        time.sleep(self.token_seconds * max_length)
+        words = ' '.join(['fresh', 'ideas', 'daily', '#motivation'] * (max_length // 16 + 1))
+        return [[{'generated_text': f"{prompt} {words}"}] for prompt in prompts]
+
+
+def install_tiny_model(registry, token_seconds=0.0):
+    """Make the model registry load TinyTextPipeline for any model name"""
+    registry.clear()
+    registry._load = lambda model_name, device: (TinyTextPipeline(token_seconds), 0.0)
@@ -0,0 +1,107 @@
+"""
+Local stand-in for the Azure OpenAI chat completions API
+
+Answers POST /openai/deployments/<deployment>/chat/completions after a fixed
+latency, as one JSON body or as a server-sent event stream when the request
+asks for stream=true. Point AZURE_OPENAI_ENDPOINT at it to run generation
+offline:
+
+    python -m benchmarks.mock_azure_openai [--port 8765] [--latency 0.2]
+"""
+import json
+import time
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+
+class MockAzureOpenAIHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    # Headers and body go out as separate writes; don't let delayed ACKs stall them
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))) or b'{}')
+        self.server.requests.append(body)
+        time.sleep(self.server.latency)
+
+        prompt = body.get('messages', [{}])[-1].get('content', '')
+        words = f"Generated reply to {len(prompt)} characters of prompt #mock #offline".split()
+
+        if body.get('stream'):
+            self._stream(words)
+        else:
+            self._send_json({
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion',
+                'created': int(time.time()),
+                'model': body.get('model', 'mock'),
+                'choices': [{
+                    'index': 0,
+                    'finish_reason': 'stop',
+                    'message': {'role': 'assistant', 'content': ' '.join(words)}
+                }],
+                'usage': {'prompt_tokens': len(prompt.split()), 'completion_tokens': len(words), 'total_tokens': 0}
+            })
+
+    def _send_json(self, payload):
+        data = json.dumps(payload).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _stream(self, words):
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+
+        # Azure opens with a content-filter chunk that has no choices
+        chunks = [{'id': 'chatcmpl-mock', 'object': 'chat.completion.chunk', 'created': 0, 'model': 'mock', 'choices': []}]
+        for index, word in enumerate(words):
+            chunks.append({
+                'id': 'chatcmpl-mock',
+                'object': 'chat.completion.chunk',
+                'created': 0,
+                'model': 'mock',
+                'choices': [{'index': 0, 'finish_reason': None, 'delta': {'content': word if index == 0 else f" {word}"}}]
+            })
+
+        for chunk in chunks:
+            self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+            self.wfile.flush()
+        self.wfile.write(b"data: [DONE]\n\n")
+        self.close_connection = True
+
+
+def start_mock_server(port=0, latency=0.2):
+    """Serve the mock API on a daemon thread; returns (server, endpoint URL)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), MockAzureOpenAIHandler)
+    server.daemon_threads = True
+    server.latency = latency
+    server.requests = []
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.2, help='seconds before each response')
+    args = parser.parse_args()
+
+    server, url = start_mock_server(args.port, args.latency)
+    print(f"Mock Azure OpenAI listening on {url} (AZURE_OPENAI_ENDPOINT={url})")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -10,18 +10,92 @@ class Config:
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     
     # Instagram API settings
-    INSTAGRAM_GRAPH_API_URL = "https://graph.facebook.com/v15.0"
+    INSTAGRAM_GRAPH_API_URL = os.environ.get('INSTAGRAM_GRAPH_API_URL', "https://graph.facebook.com/v15.0")
+    GRAPH_API_POOL_SIZE = int(os.environ.get('GRAPH_API_POOL_SIZE', '10'))
+    GRAPH_API_CONNECT_TIMEOUT = float(os.environ.get('GRAPH_API_CONNECT_TIMEOUT', '5'))
+    GRAPH_API_READ_TIMEOUT = float(os.environ.get('GRAPH_API_READ_TIMEOUT', '30'))
+    GRAPH_API_MAX_RETRIES = int(os.environ.get('GRAPH_API_MAX_RETRIES', '3'))
+    GRAPH_API_BACKOFF = float(os.environ.get('GRAPH_API_BACKOFF', '0.5'))  # Seconds, doubled per retry
+    
+    # Graph API rate-limit budget
+    GRAPH_APP_CALLS_PER_HOUR = int(os.environ.get('GRAPH_APP_CALLS_PER_HOUR', '4800'))
+    GRAPH_ACCOUNT_CALLS_PER_HOUR = int(os.environ.get('GRAPH_ACCOUNT_CALLS_PER_HOUR', '200'))
+    GRAPH_USAGE_THRESHOLD = float(os.environ.get('GRAPH_USAGE_THRESHOLD', '90'))  # Percent of reported usage
+    GRAPH_RATE_LIMIT_MAX_WAIT = float(os.environ.get('GRAPH_RATE_LIMIT_MAX_WAIT', '30'))  # Seconds
     INSTAGRAM_USER_ID = os.environ.get('INSTAGRAM_USER_ID')
     INSTAGRAM_ACCESS_TOKEN = os.environ.get('INSTAGRAM_ACCESS_TOKEN')
+    FACEBOOK_APP_ID = os.environ.get('FACEBOOK_APP_ID')
+    FACEBOOK_APP_SECRET = os.environ.get('FACEBOOK_APP_SECRET')
+    
+    # Account credential cache and token renewal
+    CREDENTIAL_CACHE_SECONDS = int(os.environ.get('CREDENTIAL_CACHE_SECONDS', '300'))  # Reload to see changes from other processes
+    TOKEN_REFRESH_MARGIN_DAYS = float(os.environ.get('TOKEN_REFRESH_MARGIN_DAYS', '7'))  # Renew tokens this long before expiry
+    TOKEN_REFRESH_CHECK_MINUTES = int(os.environ.get('TOKEN_REFRESH_CHECK_MINUTES', '60'))
+    TOKEN_REFRESH_RETRY_SECONDS = int(os.environ.get('TOKEN_REFRESH_RETRY_SECONDS', '900'))  # Wait after a failed refresh before trying again
+    
+    # Publishing concurrency settings
+    PUBLISH_MAX_CONCURRENCY = int(os.environ.get('PUBLISH_MAX_CONCURRENCY', '16'))
+    PUBLISH_PER_ACCOUNT_CONCURRENCY = int(os.environ.get('PUBLISH_PER_ACCOUNT_CONCURRENCY', '2'))
+    PUBLISH_COMMIT_BATCH_SIZE = int(os.environ.get('PUBLISH_COMMIT_BATCH_SIZE', '25'))
+    CONTAINER_POLL_SECONDS = int(os.environ.get('CONTAINER_POLL_SECONDS', '15'))
+    CONTAINER_STATUS_BATCH_SIZE = int(os.environ.get('CONTAINER_STATUS_BATCH_SIZE', '50'))  # Graph API max is 50
+    CONTAINER_MAX_ATTEMPTS = int(os.environ.get('CONTAINER_MAX_ATTEMPTS', '3'))  # Fresh containers tried after ERROR or EXPIRED
     
     # Content generation settings
     CONTENT_GENERATION_MODEL = os.environ.get('CONTENT_GENERATION_MODEL', 'gpt-neo-125M')
+    CONTENT_GENERATION_DEVICE = int(os.environ.get('CONTENT_GENERATION_DEVICE', '-1'))  # -1 for CPU
+    MODEL_REGISTRY_MAX_MODELS = int(os.environ.get('MODEL_REGISTRY_MAX_MODELS', '2'))
+    MODEL_WARMUP = os.environ.get('MODEL_WARMUP', 'false').lower() == 'true'
+    GENERATION_CACHE_VARIANTS = int(os.environ.get('GENERATION_CACHE_VARIANTS', '3'))  # Distinct texts per template and day, 0 disables the cache
+    GENERATION_CACHE_TTL_SECONDS = int(os.environ.get('GENERATION_CACHE_TTL_SECONDS', '86400'))
+    GENERATION_CACHE_MAX_KEYS = int(os.environ.get('GENERATION_CACHE_MAX_KEYS', '1024'))
+    GENERATION_CACHE_PATH = os.environ.get('GENERATION_CACHE_PATH')  # SQLite file shared by all processes, memory only if unset
+    TEMPLATE_INDEX_CACHE_SECONDS = int(os.environ.get('TEMPLATE_INDEX_CACHE_SECONDS', '300'))  # Reload to see template changes from other processes
     
     # Image storage settings
     UPLOAD_FOLDER = os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app', 'static', 'images')
+    GRADIENT_STYLE = os.environ.get('GRADIENT_STYLE', 'linear')  # linear, radial, multi_stop
+    RENDER_POOL_WORKERS = int(os.environ.get('RENDER_POOL_WORKERS', '0')) or None  # None uses all cores
+    RENDER_QUEUE_SIZE = int(os.environ.get('RENDER_QUEUE_SIZE', '64'))
+    IMAGE_CACHE_DIR = os.environ.get('IMAGE_CACHE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'cache', 'images'))  # Normalized source images, empty disables
+    IMAGE_CACHE_MAX_MB = int(os.environ.get('IMAGE_CACHE_MAX_MB', '1024'))
+    
+    # Public image hosting: azure or local, defaults to azure when a connection string is set
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND')
+    STORAGE_LOCAL_DIR = os.environ.get('STORAGE_LOCAL_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'app', 'static', 'uploads'))
+    STORAGE_PUBLIC_BASE_URL = os.environ.get('STORAGE_PUBLIC_BASE_URL', 'http://localhost:5000/static/uploads')
+    STORAGE_BLOCK_SIZE = int(os.environ.get('STORAGE_BLOCK_SIZE', str(4 * 1024 * 1024)))
+    STORAGE_UPLOAD_CONCURRENCY = int(os.environ.get('STORAGE_UPLOAD_CONCURRENCY', '4'))
     
     # Scheduling settings
     POST_FREQUENCY = os.environ.get('POST_FREQUENCY', '24') # Hours
+    POST_BUFFER_SIZE = int(os.environ.get('POST_BUFFER_SIZE', '7'))  # Ready drafts kept ahead of time
+    PRODUCER_INTERVAL_MINUTES = int(os.environ.get('PRODUCER_INTERVAL_MINUTES', '30'))
+    PUBLISH_CHECK_SECONDS = int(os.environ.get('PUBLISH_CHECK_SECONDS', '60'))
+    PUBLISH_JOB_BATCH_SIZE = int(os.environ.get('PUBLISH_JOB_BATCH_SIZE', '5'))
+    SLOT_JITTER_MINUTES = float(os.environ.get('SLOT_JITTER_MINUTES', '10'))  # Spread of each calendar slot per account
+    
+    # Metrics and profiling
+    REQUEST_PROFILER = os.environ.get('REQUEST_PROFILER', '')  # cprofile or pyinstrument (pip install pyinstrument), empty disables
+    REQUEST_PROFILE_ALL = os.environ.get('REQUEST_PROFILE_ALL', 'false').lower() == 'true'  # Otherwise only requests with ?profile=1 or X-Profile
+    REQUEST_PROFILE_DIR = os.environ.get('REQUEST_PROFILE_DIR', os.path.join(os.path.dirname(os.path.dirname(__file__)), 'profiles'))
+    
+    # Startup settings
+    AUTO_UPGRADE_SCHEMA = os.environ.get('AUTO_UPGRADE_SCHEMA', 'false').lower() == 'true'  # Otherwise run `flask upgrade-db`
+    STARTUP_PROFILE = os.environ.get('STARTUP_PROFILE', 'false').lower() == 'true'  # Log the time spent in each startup phase
+    
+    # Persistent job queue settings
+    SCHEDULER_IN_APP = os.environ.get('SCHEDULER_IN_APP', 'false').lower() == 'true'  # Otherwise run worker.py
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', '2'))  # Worker threads per process
+    JOB_POLL_SECONDS = float(os.environ.get('JOB_POLL_SECONDS', '2'))
+    JOB_LEASE_SECONDS = int(os.environ.get('JOB_LEASE_SECONDS', '60'))
+    JOB_RETRY_SECONDS = int(os.environ.get('JOB_RETRY_SECONDS', '30'))  # Doubled per attempt
+    
+    # Dashboard statistics settings
+    STATS_CACHE_SECONDS = int(os.environ.get('STATS_CACHE_SECONDS', '15'))
+    
+    # Bulk import settings
+    POST_IMPORT_CHUNK_SIZE = int(os.environ.get('POST_IMPORT_CHUNK_SIZE', '1000'))  # Rows per bulk INSERT
 
 
 class DevelopmentConfig(Config):
@@ -29,11 +103,16 @@ class DevelopmentConfig(Config):
     DEBUG = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///dev.db'
     
+    # A single development process creates its tables and runs the scheduler itself
+    AUTO_UPGRADE_SCHEMA = os.environ.get('AUTO_UPGRADE_SCHEMA', 'true').lower() == 'true'
+    SCHEDULER_IN_APP = os.environ.get('SCHEDULER_IN_APP', 'true').lower() == 'true'
+    
 
 class TestingConfig(Config):
     """Testing configuration"""
     TESTING = True
     SQLALCHEMY_DATABASE_URI = 'sqlite:///test.db'
+    AUTO_UPGRADE_SCHEMA = True
     
 
 class ProductionConfig(Config):
@@ -49,6 +128,10 @@ class ProductionConfig(Config):
     AZURE_OPENAI_ENDPOINT = os.environ.get('AZURE_OPENAI_ENDPOINT')
     AZURE_OPENAI_API_KEY = os.environ.get('AZURE_OPENAI_API_KEY')
     AZURE_OPENAI_API_VERSION = os.environ.get('AZURE_OPENAI_API_VERSION', '2024-02-01')
+    AZURE_OPENAI_MAX_CONCURRENCY = int(os.environ.get('AZURE_OPENAI_MAX_CONCURRENCY', '8'))
+    AZURE_OPENAI_DEPLOYMENT = os.environ.get('AZURE_OPENAI_DEPLOYMENT', 'gpt-4')
+    AZURE_OPENAI_TIMEOUT = float(os.environ.get('AZURE_OPENAI_TIMEOUT', '30'))  # Seconds per completion
+    AZURE_OPENAI_MAX_RETRIES = int(os.environ.get('AZURE_OPENAI_MAX_RETRIES', '2'))
 
 
 # Configuration dictionary to easily access configs
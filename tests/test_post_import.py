@@ -0,0 +1,57 @@
+from datetime import datetime, timezone
+
+from app.utils.post_import import parse_datetimes
+
+
+def local(value):
+    return value.astimezone().replace(tzinfo=None)
+
+
+def test_parse_datetimes_naive_column():
+    parsed, errors = parse_datetimes(['2024-05-01T10:00:00', '2024-05-02 11:30', '2024-05-03', None, ''])
+    assert errors == {}
+    assert parsed == [
+        datetime(2024, 5, 1, 10, 0),
+        datetime(2024, 5, 2, 11, 30),
+        datetime(2024, 5, 3),
+        None,
+        None
+    ]
+
+
+def test_parse_datetimes_mixed_valid_invalid_and_offsets():
+    values = [
+        '2024-05-01T10:00:00',
+        '2024-05-01T10:00:00Z',
+        '2024-05-01T10:00:00+02:00',
+        'bad',
+        '2024',
+        'now',
+        'today',
+        1714557600,
+        '2024-02-30T10:00:00'
+    ]
+    parsed, errors = parse_datetimes(values)
+
+    assert sorted(errors) == [3, 4, 5, 6, 7, 8]
+    assert parsed[0] == datetime(2024, 5, 1, 10, 0)
+    assert parsed[1] == local(datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc))
+    assert parsed[2] == local(datetime(2024, 5, 1, 8, 0, tzinfo=timezone.utc))
+
+
+def test_parse_datetimes_validity_does_not_depend_on_other_rows():
+    alone, alone_errors = parse_datetimes(['2024'])
+    mixed, mixed_errors = parse_datetimes(['2024', '2024-05-01T10:00:00'])
+    assert alone_errors == {0: "Invalid scheduled_time '2024'"}
+    assert mixed_errors == {0: "Invalid scheduled_time '2024'"}
+    assert mixed[1] == datetime(2024, 5, 1, 10, 0)
+
+    parsed, errors = parse_datetimes(['2024-05-01T10:00:00', 'bad'])
+    assert parsed[0] == datetime(2024, 5, 1, 10, 0)
+    assert list(errors) == [1]
+
+
+def test_parse_datetimes_offset_only_column():
+    parsed, errors = parse_datetimes(['2024-05-01T10:00:00Z'])
+    assert errors == {}
+    assert parsed == [local(datetime(2024, 5, 1, 10, 0, tzinfo=timezone.utc))]
@@ -0,0 +1,61 @@
+import os
+import signal
+import logging
+import argparse
+import threading
+from dotenv import load_dotenv
+
+# Load environment variables from .env file if exists
+env_file = os.path.join(os.path.dirname(__file__), '.env')
+if os.path.exists(env_file):
+    load_dotenv(env_file)
+
+# The web app must not start its own scheduler inside this process
+os.environ['SCHEDULER_IN_APP'] = 'false'
+
+from app import create_app, start_background_services, shutdown_services
+
+# Determine environment
+env = os.environ.get('FLASK_ENV', 'development')
+
+# Configure logging
+logging.basicConfig(
+    level=logging.INFO,
+    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+    handlers=[
+        logging.FileHandler("worker.log"),
+        logging.StreamHandler()
+    ]
+)
+
+
+def main():
+    """
+    Run the posting scheduler and job queue workers outside the web app
+    Start any number of these; jobs are claimed from the database so each
+    one runs exactly once. Set SCHEDULER_IN_APP=false for the web workers.
+    """
+    parser = argparse.ArgumentParser(description='Instagram automation background worker')
+    parser.add_argument('--no-scheduler', action='store_true', help='only run job workers, do not enqueue periodic jobs')
+    parser.add_argument('--workers', type=int, default=None, help='worker threads (defaults to JOB_WORKERS)')
+    parser.add_argument('--kinds', nargs='*', default=None, help='only run these job kinds')
+    args = parser.parse_args()
+    
+    app = create_app(env)
+    start_background_services(
+        app,
+        run_scheduler=not args.no_scheduler,
+        worker_count=args.workers,
+        kinds=args.kinds
+    )
+    
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    signal.signal(signal.SIGINT, lambda *_: stop.set())
+    stop.wait()
+    
+    shutdown_services()
+
+
+if __name__ == '__main__':
+    main()